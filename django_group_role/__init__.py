@@ -1,21 +1,43 @@
 from .exceptions import BadRoleException
-from .roles import Role, load_roles, registry
+from .instrumentation import timed
+from .membership import (
+    aget_user_group_names,
+    ainvalidate_user_roles,
+    get_roles_for_users,
+    get_user_group_names,
+    invalidate_user_roles,
+    prefetch_user_roles,
+    users_in_roles,
+)
+from .roles import Role, is_hierarchical, load_roles, registry, roles_with_perm
 from .signals import post_role_setup, pre_role_setup
 
 
 def _get_role(role) -> Role:
     assert isinstance(role, (Role, str))
     if isinstance(role, str):
-        load_roles()
         try:
-            role = registry[role]
+            role = load_roles()[role]
         except KeyError:
             raise BadRoleException(f"Role {role} is not registered")
 
     return role
 
 
-def is_user_in_role(user, role) -> bool:
+def _get_role_names(role) -> frozenset:
+    # hierarchical roles are held by users of the roles extending them
+    if is_hierarchical():
+        return load_roles().with_descendants([role.name])
+    return frozenset([role.name])
+
+
+def _get_user_roles(names) -> frozenset:
+    roles = load_roles()
+    names = frozenset(name for name in names if name in roles)
+    return roles.with_ancestors(names) if is_hierarchical() else names
+
+
+def is_user_in_role(user, role, using=None) -> bool:
     try:
         role = _get_role(role)
     except BadRoleException:
@@ -23,7 +45,38 @@ def is_user_in_role(user, role) -> bool:
         # cannot have that role
         return False
 
-    return user.groups.filter(name=role.name).exists()
+    if using is None and isinstance(role, Role):
+        # role instances may be bound to a database
+        using = role.using
+    with timed("membership.is_user_in_role", using=using, model="auth.Group"):
+        return not _get_role_names(role).isdisjoint(get_user_group_names(user, using))
+
+
+def get_user_roles(user, using=None) -> frozenset:
+    """Returns the names of the registered roles the user belongs to.
+
+    Hierarchical roles also include the roles extended by the user ones.
+    """
+    return _get_user_roles(get_user_group_names(user, using))
+
+
+async def ais_user_in_role(user, role, using=None) -> bool:
+    """Async version of ``is_user_in_role``, sharing the same caches."""
+    try:
+        role = _get_role(role)
+    except BadRoleException:
+        return False
+
+    if using is None and isinstance(role, Role):
+        using = role.using
+    return not _get_role_names(role).isdisjoint(
+        await aget_user_group_names(user, using)
+    )
+
+
+async def aget_user_roles(user, using=None) -> frozenset:
+    """Async version of ``get_user_roles``, sharing the same caches."""
+    return _get_user_roles(await aget_user_group_names(user, using))
 
 
 __version__ = (0, 7, 4)
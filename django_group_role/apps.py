@@ -4,3 +4,59 @@ from django.apps import AppConfig
 class DjangoGroupRoleConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "django_group_role"
+
+    def ready(self):
+        from django.conf import settings
+        from django.contrib.auth import get_user_model
+        from django.contrib.auth.models import Group
+        from django.db.models.signals import (
+            m2m_changed,
+            post_delete,
+            post_save,
+            pre_delete,
+            pre_save,
+        )
+
+        from .membership import (
+            group_deleting,
+            group_members_changed,
+            group_saving,
+            user_groups_changed,
+        )
+        from .roles import group_changed
+
+        for signal in (post_save, post_delete):
+            signal.connect(
+                group_changed,
+                sender=Group,
+                dispatch_uid="django_group_role.group_changed",
+            )
+            signal.connect(
+                group_members_changed,
+                sender=Group,
+                dispatch_uid="django_group_role.group_members_changed",
+            )
+        pre_save.connect(
+            group_saving,
+            sender=Group,
+            dispatch_uid="django_group_role.group_saving",
+        )
+        pre_delete.connect(
+            group_deleting,
+            sender=Group,
+            dispatch_uid="django_group_role.group_deleting",
+        )
+
+        groups = getattr(get_user_model(), "groups", None)
+        if groups is not None:
+            m2m_changed.connect(
+                user_groups_changed,
+                sender=groups.through,
+                dispatch_uid="django_group_role.user_groups_changed",
+            )
+
+        if getattr(settings, "ROLES_LOAD_ON_READY", False):
+            # load roles (and their indexes) before serving any request
+            from .roles import load_roles
+
+            load_roles()
@@ -0,0 +1,65 @@
+from django.contrib.auth.backends import BaseBackend
+
+from . import get_user_roles
+from .instrumentation import increment
+from .roles import registry
+from .utils import get_wildcard_permissions
+
+# attribute used to cache permissions on user instances
+_PERM_CACHE_ATTR = "_group_role_perm_cache"
+
+
+class RoleBackend(BaseBackend):
+    """Authorization backend which resolves permissions from role definitions.
+
+    Only the group names of the user are loaded from the database (and cached
+    on the user instance), permissions are resolved by roles declarations
+    thus they are expected to be aligned with the database through the
+    ``populate_roles`` command. Declared permissions missing from the database
+    are granted anyway, while wildcards only grant permissions declared by
+    models. Object permissions are not supported.
+    """
+
+    def _get_roles(self, user_obj) -> frozenset:
+        if not user_obj.is_active or user_obj.is_anonymous:
+            return frozenset()
+        return get_user_roles(user_obj)
+
+    def get_group_permissions(self, user_obj, obj=None) -> set:
+        if obj is not None:
+            return set()
+
+        roles = self._get_roles(user_obj)
+        cached_roles, perms = getattr(user_obj, _PERM_CACHE_ATTR, (None, None))
+        if cached_roles != roles:
+            increment("backend.perm_cache.miss")
+            perms = frozenset().union(
+                *(registry[name]._perm_index for name in roles),
+                # permissions declared by models granted through wildcards
+                *(
+                    get_wildcard_permissions(app_label, modelname)
+                    for name in roles
+                    for app_label, models in registry[name]._perm_wildcards.items()
+                    for modelname in models
+                ),
+            )
+            setattr(user_obj, _PERM_CACHE_ATTR, (roles, perms))
+        else:
+            increment("backend.perm_cache.hit")
+        return set(perms)
+
+    def get_all_permissions(self, user_obj, obj=None) -> set:
+        return self.get_group_permissions(user_obj, obj)
+
+    def has_perm(self, user_obj, perm, obj=None) -> bool:
+        if obj is not None:
+            return False
+        # roles of the user are loaded first, since they also load the registry
+        roles = self._get_roles(user_obj)
+        return not registry.roles_with_perm(perm).isdisjoint(roles)
+
+    def has_module_perms(self, user_obj, app_label) -> bool:
+        prefix = f"{app_label}."
+        return any(
+            perm.startswith(prefix) for perm in self.get_all_permissions(user_obj)
+        )
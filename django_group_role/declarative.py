@@ -0,0 +1,208 @@
+import hashlib
+import json
+import marshal
+import os
+import re
+import threading
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .utils import map_permissions
+
+# bumped whenever the layout of compiled role files changes
+_COMPILED_VERSION = 1
+_ROLE_KEYS = {"permissions", "extends", "abstract"}
+
+# roles built from each file, by path, along with the file digest
+_loaded_files = {}
+_lock = threading.Lock()
+
+
+def _parse(path: Path, content: bytes) -> dict:
+    if path.suffix == ".json":
+        return json.loads(content)
+    if path.suffix == ".toml":
+        try:
+            import tomllib
+        except ImportError:
+            raise ImproperlyConfigured(
+                "TOML role files require Python 3.11 or later, use JSON instead"
+            )
+        return tomllib.loads(content.decode())
+    raise ImproperlyConfigured(
+        f"Role file {path} must be either a .json or a .toml file"
+    )
+
+
+def _sort_roles(definitions: dict) -> list:
+    """Returns role names sorted so that base roles precede their children."""
+    done, visiting, ordered = set(), [], []
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            cycle = " -> ".join(visiting[visiting.index(name) :] + [name])
+            raise ImproperlyConfigured(f"Role inheritance cycle: {cycle}")
+        if name not in definitions:
+            raise ImproperlyConfigured(
+                f"Role {visiting[-1]} extends unknown role {name}"
+            )
+        visiting.append(name)
+        for base in definitions[name]["extends"]:
+            visit(base)
+        visiting.pop()
+        done.add(name)
+        ordered.append(name)
+
+    for name in definitions:
+        visit(name)
+    return ordered
+
+
+def _compile(data: dict) -> list:
+    """Normalizes role definitions.
+
+    Returns a list of ``(name, extends, abstract, permissions, merged)``
+    tuples, sorted so that base roles precede their children, where
+    ``merged`` is the permission map merged with base roles ones. Permission
+    maps only use builtin types, to be stored by ``marshal``.
+    """
+    if not isinstance(data, dict):
+        raise ImproperlyConfigured("Role files must map role names to roles")
+    definitions = {}
+    for name, definition in data.items():
+        if not isinstance(definition, dict):
+            raise ImproperlyConfigured(f"Role {name} must be a mapping")
+        unknown = definition.keys() - _ROLE_KEYS
+        if unknown:
+            raise ImproperlyConfigured(
+                f"Role {name} has unknown keys: {', '.join(sorted(unknown))}"
+            )
+        extends = definition.get("extends", ())
+        definitions[name] = {
+            "extends": (extends,) if isinstance(extends, str) else tuple(extends),
+            "abstract": bool(definition.get("abstract", False)),
+            "permissions": definition.get("permissions", ()),
+        }
+
+    compiled, merged = [], {}
+    for name in _sort_roles(definitions):
+        definition = definitions[name]
+        try:
+            perm_map = map_permissions(
+                definition["permissions"],
+                *(merged[base] for base in definition["extends"]),
+            )
+        except (AssertionError, ValueError) as ex:
+            raise ImproperlyConfigured(f"Role {name} is not valid: {ex}")
+        if not perm_map:
+            raise ImproperlyConfigured(
+                f"Role {name} must specify at least 1 permission"
+            )
+        merged[name] = {
+            app_label: {model: sorted(perms) for model, perms in app_perms.items()}
+            for app_label, app_perms in perm_map.items()
+        }
+        permissions = definition["permissions"]
+        compiled.append(
+            (
+                name,
+                definition["extends"],
+                definition["abstract"],
+                list(permissions) if isinstance(permissions, tuple) else permissions,
+                merged[name],
+            )
+        )
+    return compiled
+
+
+def _get_compiled_path(path: Path, digest: str) -> Path:
+    from django.conf import settings
+
+    # like python bytecode, compiled files are stored in __pycache__
+    directory = getattr(settings, "ROLES_COMPILED_DIR", None)
+    directory = Path(directory) if directory else path.parent / "__pycache__"
+    return directory / f"{path.stem}.{digest[:16]}.roles"
+
+
+def _load_compiled(path: Path, content: bytes, digest: str) -> list:
+    compiled_path = _get_compiled_path(path, digest)
+    try:
+        version, file_digest, compiled = marshal.loads(compiled_path.read_bytes())
+        if version == _COMPILED_VERSION and file_digest == digest:
+            return compiled
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    try:
+        data = _parse(path, content)
+    except ValueError as ex:
+        raise ImproperlyConfigured(f"Unable to parse role file {path} ({ex})")
+    compiled = _compile(data)
+    try:
+        compiled_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = compiled_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(marshal.dumps((_COMPILED_VERSION, digest, compiled)))
+        os.replace(tmp_path, compiled_path)
+    except OSError:
+        # as for python bytecode, failing to store compiled roles is harmless
+        pass
+    return compiled
+
+
+def _class_name(name: str) -> str:
+    return re.sub(r"\W|^(?=\d)", "_", name)
+
+
+def _build_roles(compiled) -> dict:
+    from .roles import Role
+
+    classes = {}
+    for name, extends, abstract, permissions, merged in compiled:
+        classes[name] = type(Role)(
+            _class_name(name),
+            tuple(classes[base] for base in extends) or (Role,),
+            {
+                "__module__": __name__,
+                "name": name,
+                "abstract": abstract,
+                "permissions": permissions,
+                # precompiled permissions skip normalization
+                "_permissions": {
+                    app_label: {model: set(perms) for model, perms in app_perms.items()}
+                    for app_label, app_perms in merged.items()
+                },
+            },
+            register=False,
+        )
+    return {name: role for name, role in classes.items() if not role.abstract}
+
+
+def load_role_file(path) -> dict:
+    """Builds roles declared in a JSON or TOML file, returning them by name.
+
+    The file maps role names to their definition, providing ``permissions``
+    (as a list or a dict, like ``Role.permissions``), optionally the names
+    of the roles it ``extends`` and whether it is ``abstract``. Abstract
+    roles are not returned, returned roles are not registered.
+
+    Normalized permissions are stored by ``marshal`` in a compiled file keyed
+    by the file hash, thus following loads (even by other processes) skip
+    normalization until the file changes. Roles built from unchanged files
+    are returned again.
+    """
+    path = Path(path)
+    try:
+        content = path.read_bytes()
+    except OSError as ex:
+        raise ImproperlyConfigured(f"Unable to read role file {path} ({ex})")
+
+    digest = hashlib.sha256(content).hexdigest()
+    with _lock:
+        loaded = _loaded_files.get(path)
+        if loaded is None or loaded[0] != digest:
+            compiled = _load_compiled(path, content, digest)
+            loaded = _loaded_files[path] = (digest, _build_roles(compiled))
+    return dict(loaded[1])
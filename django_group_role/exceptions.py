@@ -1,4 +1,8 @@
 class BadRoleException(Exception):
-    def __init__(self, message, permission):
+    def __init__(self, message, permission=None, permissions=()):
         self.permission = permission
+        # every permission which caused the error
+        if not permissions and permission:
+            permissions = (permission,)
+        self.permissions = tuple(permissions)
         super().__init__(message)
@@ -0,0 +1,191 @@
+"""Metrics of role operations, reported to a pluggable collector.
+
+The collector is configured with the ``ROLES_METRICS_COLLECTOR`` setting,
+which provides the dotted path of either a collector class or a callable
+returning a collector. If not set no metric is reported.
+"""
+
+from collections import defaultdict
+from contextlib import nullcontext
+from typing import Protocol
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+_UNSET = object()
+_collector = _UNSET
+
+
+class MetricsCollector(Protocol):
+    """Interface of metrics collectors.
+
+    Metric names are dotted (i.e. ``role.setup_permissions``), tags are a
+    (possibly empty) dict of strings.
+    """
+
+    def increment(self, name: str, value: int = 1, tags: dict = None):
+        """Increments a counter."""
+
+    def timing(self, name: str, elapsed: float, tags: dict = None):
+        """Records the duration of an operation, in seconds."""
+
+
+class InMemoryCollector:
+    """Collector which keeps metrics in memory, i.e. to be read by tests.
+
+    Counters are summed and timings are listed by metric name, regardless of
+    tags, while ``events`` lists every reported metric along with its tags.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.counters = defaultdict(int)
+        self.timings = defaultdict(list)
+        self.events = []
+
+    def increment(self, name, value=1, tags=None):
+        self.counters[name] += value
+        self.events.append(("increment", name, value, tags or {}))
+
+    def timing(self, name, elapsed, tags=None):
+        self.timings[name].append(elapsed)
+        self.events.append(("timing", name, elapsed, tags or {}))
+
+
+class StatsdCollector:
+    """Adapter reporting metrics through a StatsD client.
+
+    The client must provide the ``incr(name, count)`` and ``timing(name, ms)``
+    methods (as ``statsd.StatsClient`` does). Since StatsD does not support
+    tags, they are ignored.
+    """
+
+    def __init__(self, client, prefix="django_group_role"):
+        self.client = client
+        self.prefix = prefix
+
+    def increment(self, name, value=1, tags=None):
+        self.client.incr(f"{self.prefix}.{name}", value)
+
+    def timing(self, name, elapsed, tags=None):
+        self.client.timing(f"{self.prefix}.{name}", elapsed * 1000)
+
+
+class PrometheusCollector:
+    """Adapter reporting metrics as Prometheus counters and histograms.
+
+    Metrics are created upon first use in the provided registry (defaults to
+    the ``prometheus_client`` global one), labelled by tags. Dots in names
+    are replaced by underscores, counters are suffixed by ``_total`` and
+    timings by ``_seconds``.
+    """
+
+    def __init__(self, registry=None, namespace="django_group_role"):
+        try:
+            import prometheus_client
+        except ImportError:
+            from django.core.exceptions import ImproperlyConfigured
+
+            raise ImproperlyConfigured(
+                "prometheus_client is required to report metrics to Prometheus"
+            )
+
+        self.prometheus_client = prometheus_client
+        self.registry = registry or prometheus_client.REGISTRY
+        self.namespace = namespace
+        self.metrics = {}
+
+    def _get_metric(self, cls, name, tags):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = cls(
+                name.replace(".", "_"),
+                name,
+                labelnames=sorted(tags or ()),
+                namespace=self.namespace,
+                registry=self.registry,
+            )
+        return metric.labels(**tags) if tags else metric
+
+    def increment(self, name, value=1, tags=None):
+        counter = self._get_metric(self.prometheus_client.Counter, name, tags)
+        counter.inc(value)
+
+    def timing(self, name, elapsed, tags=None):
+        histogram = self._get_metric(
+            self.prometheus_client.Histogram, f"{name}.seconds", tags
+        )
+        histogram.observe(elapsed)
+
+
+def get_collector():
+    """Returns the configured metrics collector, None if not configured."""
+    global _collector
+
+    collector = _collector
+    if collector is _UNSET:
+        from django.conf import settings
+        from django.utils.module_loading import import_string
+
+        path = getattr(settings, "ROLES_METRICS_COLLECTOR", None)
+        collector = _collector = import_string(path)() if path else None
+    return collector
+
+
+@receiver(setting_changed)
+def _reset_collector(setting, **kwargs):
+    global _collector
+
+    if setting == "ROLES_METRICS_COLLECTOR":
+        _collector = _UNSET
+
+
+def increment(name, value=1, **tags):
+    """Increments a counter of the configured collector, if any."""
+    collector = get_collector()
+    if collector is not None:
+        collector.increment(name, value, tags)
+
+
+class _Timer:
+    def __init__(self, collector, name, using, tags):
+        from .utils import Measure
+
+        self.collector = collector
+        self.name = name
+        self.tags = tags
+        self.measure = Measure(using)
+
+    def __enter__(self):
+        self.measure.__enter__()
+        return self.measure
+
+    def __exit__(self, *exc_info):
+        result = self.measure.__exit__(*exc_info)
+        self.collector.timing(self.name, self.measure.elapsed, self.tags)
+        self.collector.increment(
+            f"{self.name}.queries", self.measure.queries, self.tags
+        )
+        return result
+
+
+def timed(name, using=None, model=None, **tags):
+    """Reports duration and queries (of the ``using`` database) of a block.
+
+    The duration is reported as the ``name`` timing, while executed queries
+    increment the ``{name}.queries`` counter. If ``using`` is not provided
+    queries are counted on the database chosen by routers for reading the
+    ``model`` (given as ``app_label.ModelName``), if any. Nothing is measured
+    if no collector is configured.
+    """
+    collector = get_collector()
+    if collector is None:
+        return nullcontext()
+    if using is None and model is not None:
+        from django.apps import apps
+        from django.db import router
+
+        using = router.db_for_read(apps.get_model(model))
+    return _Timer(collector, name, using, tags)
@@ -1,6 +1,10 @@
-from django.core.management.base import BaseCommand
-from ...exceptions import BadRoleException
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
 from ...roles import registry, load_roles
+from ...sync import plan_roles, sync_roles
 
 
 def _fuzzy_search(rolenames):
@@ -25,6 +29,14 @@ def _standard_search(rolenames):
     return search
 
 
+def _run_in_thread(func, alias, *args, **kwargs):
+    try:
+        return func(*args, using=alias, **kwargs)
+    finally:
+        # each worker thread opens its own connection
+        connections[alias].close()
+
+
 class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("args", nargs="*", help="""Roles to setup""")
@@ -43,10 +55,77 @@ class Command(BaseCommand):
             help="""Enable role/group fuzzy equality (spaces, dash, underscore and case are ignored)""",
         )
 
+        parser.add_argument(
+            "--plan",
+            dest="plan",
+            action="store_true",
+            help="""Print permissions each role would gain and lose as JSON, without changing the database""",
+        )
+        parser.add_argument(
+            "--database",
+            dest="databases",
+            action="append",
+            help="""Database to setup roles on, can be provided many times. Defaults to the database groups are routed to for writes""",
+        )
+        parser.add_argument(
+            "--all-databases",
+            dest="all_databases",
+            action="store_true",
+            help="""Setup roles on every configured database""",
+        )
+        parser.add_argument(
+            "--workers",
+            dest="workers",
+            type=int,
+            default=1,
+            help="""Number of databases handled concurrently, each within its own transaction""",
+        )
+
+    def get_databases(self, options):
+        if options.get("all_databases"):
+            return list(connections)
+        databases = list(dict.fromkeys(options.get("databases") or ()))
+        for alias in databases:
+            if alias not in connections:
+                raise CommandError(f'Database "{alias}" is not configured')
+        if not databases:
+            from django.contrib.auth.models import Group
+
+            databases = [router.db_for_write(Group)]
+        return databases
+
+    def run(self, func, databases, workers, *args, **kwargs):
+        """Runs ``func`` on each database, returning outcomes by alias.
+
+        Outcomes are either the returned value or the raised exception, so that
+        a failing database does not prevent the others from being handled.
+        """
+        outcomes = {}
+        if workers > 1 and len(databases) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    alias: executor.submit(_run_in_thread, func, alias, *args, **kwargs)
+                    for alias in databases
+                }
+            for alias, future in futures.items():
+                outcomes[alias] = future.exception() or future.result()
+        else:
+            for alias in databases:
+                try:
+                    outcomes[alias] = func(*args, using=alias, **kwargs)
+                except Exception as ex:
+                    outcomes[alias] = ex
+        return outcomes
+
     def handle(self, *rolenames, **options):
         clear = options.get("clear", False)
         fuzzy = options.get("fuzzy", False)
-        if clear:
+        plan = options.get("plan", False)
+        workers = options.get("workers", 1)
+        if workers < 1:
+            raise CommandError("Workers must be a positive number")
+        databases = self.get_databases(options)
+        if clear and not plan:
             self.stdout.write(
                 "Clear mode enabled, already bound permissions will be removed!",
                 self.style.NOTICE,
@@ -57,19 +136,66 @@ class Command(BaseCommand):
             check_name = _standard_search(rolenames)
         # assure roles are loaded
         load_roles()
-        for name, role in registry.items():
-            if check_name(name):
-                self.stdout.write(f'Setting permissions for role "{name}"...')
-                # istantiate role class
-                role = role()
-                try:
-                    role.setup_permissions(clear)
-                except BadRoleException as ex:
-                    self.stdout.write(
-                        f'Unable to bound permission to "{name}" ({ex})',
-                        self.style.ERROR,
-                    )
-                else:
+        roles = [role for name, role in registry.items() if check_name(name)]
+        func = plan_roles if plan else sync_roles
+        outcomes = self.run(func, databases, workers, roles, clear=clear)
+        failed = {
+            alias: ex for alias, ex in outcomes.items() if isinstance(ex, Exception)
+        }
+        if plan:
+            reports = {
+                alias: report.as_dict()
+                for alias, report in outcomes.items()
+                if alias not in failed
+            }
+            if len(databases) == 1:
+                output = {"clear": clear, **reports.get(databases[0], {})}
+            else:
+                output = {"clear": clear, "databases": reports}
+            if reports:
+                self.stdout.write(json.dumps(output, indent=2))
+        else:
+            errors = []
+            for alias, report in outcomes.items():
+                if alias in failed:
+                    continue
+                if len(databases) > 1:
                     self.stdout.write(
-                        f'Role "{name}" setup completed!', self.style.SUCCESS
+                        f'Database "{alias}":', self.style.MIGRATE_HEADING
                     )
+                self.write_report(report, options["verbosity"])
+                errors.extend((alias, name) for name in report.errors)
+            if errors and len(databases) > 1:
+                self.stdout.write(
+                    "Roles failed: "
+                    + ", ".join(f'"{name}" ({alias})' for alias, name in errors),
+                    self.style.ERROR,
+                )
+        if failed:
+            raise CommandError(
+                "Unable to setup roles on "
+                + ", ".join(f'"{alias}" ({ex})' for alias, ex in failed.items())
+            )
+
+    def write_report(self, report, verbosity):
+        for name, result in report.roles.items():
+            self.stdout.write(f'Setting permissions for role "{name}"...')
+            if result.error:
+                self.stdout.write(
+                    f'Unable to bound permission to "{name}" ({result.error})',
+                    self.style.ERROR,
+                )
+            else:
+                self.stdout.write(f'Role "{name}" setup completed!', self.style.SUCCESS)
+            if verbosity > 1 and result.diff:
+                self.stdout.write(
+                    f"  {len(result.diff.added)} added, "
+                    f"{len(result.diff.removed)} removed "
+                    f"({result.elapsed * 1000:.2f}ms, {result.queries} queries)"
+                )
+        if verbosity > 1:
+            for phase, elapsed in report.elapsed.items():
+                self.stdout.write(
+                    f"Phase {phase}: {elapsed * 1000:.2f}ms, "
+                    f"{report.queries[phase]} queries"
+                )
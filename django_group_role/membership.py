@@ -0,0 +1,419 @@
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+from .instrumentation import increment
+
+# attribute used to cache group names on user instances
+_USER_CACHE_ATTR = "_group_role_names"
+# attribute used to track users invalidated by uncommitted transactions
+_PENDING_ATTR = "_group_role_pending"
+# attribute used to collect members of renamed or deleted groups
+_MEMBERS_ATTR = "_group_role_members"
+
+_VERSION_KEY = "group_role:version:{}"
+_NAMES_KEY = "group_role:names:{}:{}"
+
+
+def _get_shared_cache():
+    """Returns the cache configured to share membership among processes.
+
+    The cache is configured with the ``ROLES_CACHE`` setting, which provides
+    the alias of the cache to use, if not set membership is not shared.
+    """
+    from django.conf import settings
+    from django.core.cache import caches
+
+    alias = getattr(settings, "ROLES_CACHE", None)
+    return caches[alias] if alias else None
+
+
+def _get_pending(using=None) -> set:
+    connection = transaction.get_connection(using)
+    # pending users are tracked by outermost atomic block, thus users left
+    # by rolled back transactions are dropped once a new one starts
+    block = connection.atomic_blocks[0] if connection.in_atomic_block else None
+    owner, pending = getattr(connection, _PENDING_ATTR, (None, None))
+    if pending is None or owner is not block:
+        pending = set()
+        setattr(connection, _PENDING_ATTR, (block, pending))
+    return pending
+
+
+def _get_user_version(cache, user_pk) -> str:
+    key = _VERSION_KEY.format(user_pk)
+    version = cache.get(key)
+    if version is None:
+        # versions are random to never match data cached before eviction
+        version = uuid4().hex
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def _get_groups_queryset(user, using=None):
+    # reads are routed by database routers (i.e. to replicas) by default
+    groups = user.groups.all()
+    return groups.using(using) if using else groups
+
+
+def _get_write_db(user) -> str:
+    from django.db import router
+
+    return router.db_for_write(type(user), instance=user)
+
+
+def _load_group_names(user, using=None) -> frozenset:
+    prefetched = getattr(user, "_prefetched_objects_cache", {})
+    if "groups" in prefetched:
+        return frozenset(group.name for group in prefetched["groups"])
+    return frozenset(_get_groups_queryset(user, using).values_list("name", flat=True))
+
+
+def _load_shared_group_names(cache, user, using=None) -> frozenset:
+    from django.conf import settings
+    from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+    if user.pk is None:
+        return _load_group_names(user, using)
+    write_db = _get_write_db(user)
+    if user.pk in _get_pending(write_db):
+        # membership changed by the current transaction is not shared, nor
+        # visible to replicas
+        return _load_group_names(user, write_db)
+
+    key = _NAMES_KEY.format(user.pk, _get_user_version(cache, user.pk))
+    names = cache.get(key)
+    if names is None:
+        increment("membership.shared_cache.miss")
+        names = _load_group_names(user, using)
+        timeout = getattr(settings, "ROLES_CACHE_TIMEOUT", DEFAULT_TIMEOUT)
+        cache.set(key, names, timeout=timeout)
+    else:
+        increment("membership.shared_cache.hit")
+    return names
+
+
+def get_user_group_names(user, using=None) -> frozenset:
+    """Returns the names of every group the user belongs to.
+
+    Group names are loaded with a single query (unless groups were prefetched)
+    and then cached on the user instance, thus following calls are answered
+    from memory. If the
+    ``ROLES_CACHE`` setting is provided they are also shared among processes
+    through the configured cache. Groups are read from the ``using`` database,
+    if provided, otherwise from the one chosen by database routers.
+    """
+    try:
+        names = getattr(user, _USER_CACHE_ATTR)
+    except AttributeError:
+        increment("membership.instance_cache.miss")
+    else:
+        increment("membership.instance_cache.hit")
+        return names
+
+    cache = _get_shared_cache()
+    if cache is None or "groups" in getattr(user, "_prefetched_objects_cache", {}):
+        names = _load_group_names(user, using)
+    else:
+        names = _load_shared_group_names(cache, user, using)
+    setattr(user, _USER_CACHE_ATTR, names)
+    return names
+
+
+async def _aload_group_names(user, using=None) -> frozenset:
+    prefetched = getattr(user, "_prefetched_objects_cache", {})
+    if "groups" in prefetched:
+        return frozenset(group.name for group in prefetched["groups"])
+    groups = _get_groups_queryset(user, using)
+    return frozenset([name async for name in groups.values_list("name", flat=True)])
+
+
+async def _aget_user_version(cache, user_pk) -> str:
+    key = _VERSION_KEY.format(user_pk)
+    version = await cache.aget(key)
+    if version is None:
+        version = uuid4().hex
+        if not await cache.aadd(key, version, timeout=None):
+            version = await cache.aget(key, version)
+    return version
+
+
+async def _aload_shared_group_names(cache, user, using=None) -> frozenset:
+    from django.conf import settings
+    from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+    write_db = _get_write_db(user)
+    # transactions belong to the thread running sync code
+    if user.pk in await sync_to_async(_get_pending)(write_db):
+        return await _aload_group_names(user, write_db)
+
+    key = _NAMES_KEY.format(user.pk, await _aget_user_version(cache, user.pk))
+    names = await cache.aget(key)
+    if names is None:
+        increment("membership.shared_cache.miss")
+        names = await _aload_group_names(user, using)
+        timeout = getattr(settings, "ROLES_CACHE_TIMEOUT", DEFAULT_TIMEOUT)
+        await cache.aset(key, names, timeout=timeout)
+    else:
+        increment("membership.shared_cache.hit")
+    return names
+
+
+async def aget_user_group_names(user, using=None) -> frozenset:
+    """Async version of ``get_user_group_names``, sharing the same caches."""
+    try:
+        names = getattr(user, _USER_CACHE_ATTR)
+    except AttributeError:
+        increment("membership.instance_cache.miss")
+    else:
+        increment("membership.instance_cache.hit")
+        return names
+
+    cache = _get_shared_cache()
+    if (
+        cache is None
+        or user.pk is None
+        or "groups" in getattr(user, "_prefetched_objects_cache", {})
+    ):
+        names = await _aload_group_names(user, using)
+    else:
+        names = await _aload_shared_group_names(cache, user, using)
+    setattr(user, _USER_CACHE_ATTR, names)
+    return names
+
+
+def _bump_versions(cache, pks, using=None):
+    def bump():
+        cache.set_many({_VERSION_KEY.format(pk): uuid4().hex for pk in pks}, None)
+        pending.difference_update(pks)
+
+    pending = _get_pending(using)
+    if transaction.get_connection(using).in_atomic_block:
+        # until changes are committed membership of these users is not shared
+        pending.update(pks)
+    transaction.on_commit(bump, using=using)
+
+
+def _drop_cached_roles(users) -> set:
+    """Drops membership cached on user instances, returning users pks."""
+    pks = set()
+    for user in users:
+        try:
+            delattr(user, _USER_CACHE_ATTR)
+        except AttributeError:
+            # either nothing cached or not a user instance (i.e. a pk)
+            pass
+        pk = getattr(user, "pk", user)
+        if pk is not None:
+            pks.add(pk)
+    return pks
+
+
+def invalidate_user_roles(*users, using=None):
+    """Drops role membership cached for the provided users.
+
+    Users may be provided either as instances or as primary keys, membership
+    shared among processes is invalidated once the transaction is committed.
+    """
+    pks = _drop_cached_roles(users)
+    cache = _get_shared_cache()
+    if cache is not None and pks:
+        _bump_versions(cache, pks, using)
+
+
+async def ainvalidate_user_roles(*users, using=None):
+    """Async version of ``invalidate_user_roles``."""
+    pks = _drop_cached_roles(users)
+    cache = _get_shared_cache()
+    if cache is not None and pks:
+        # transactions (and their callbacks) belong to the thread running sync
+        # code, where membership is invalidated once they are committed
+        await sync_to_async(_bump_versions)(cache, pks, using)
+
+
+def user_groups_changed(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """Invalidates membership when ``User.groups`` is changed."""
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+
+    if not reverse:
+        invalidate_user_roles(instance, using=using)
+    elif action != "pre_clear":
+        invalidate_user_roles(*pk_set, using=using)
+    elif _get_shared_cache() is not None:
+        # a group is going to be cleared, every member must be invalidated
+        pks = instance.user_set.using(using).values_list("pk", flat=True)
+        invalidate_user_roles(*pks, using=using)
+
+
+def _collect_members(group, using):
+    if _get_shared_cache() is not None:
+        members = group.user_set.using(using).values_list("pk", flat=True)
+        setattr(group, _MEMBERS_ATTR, list(members))
+
+
+def group_deleting(sender, instance, using, **kwargs):
+    """Collects members of a group about to be deleted.
+
+    Memberships are deleted along with the group without ``m2m_changed``
+    signals, thus members are collected beforehand to invalidate them.
+    """
+    _collect_members(instance, using)
+
+
+def group_saving(sender, instance, using, update_fields=None, **kwargs):
+    """Collects members of a group about to be renamed."""
+    if instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and "name" not in update_fields:
+        return
+    if _get_shared_cache() is None:
+        return
+    name = (
+        sender._default_manager.using(using)
+        .filter(pk=instance.pk)
+        .values_list("name", flat=True)
+        .first()
+    )
+    if name is not None and name != instance.name:
+        _collect_members(instance, using)
+
+
+def group_members_changed(sender, instance, using, **kwargs):
+    """Invalidates members of a renamed or deleted group."""
+    members = instance.__dict__.pop(_MEMBERS_ATTR, None)
+    if members:
+        invalidate_user_roles(*members, using=using)
+
+
+def get_user_groups_through() -> tuple:
+    """Returns the ``User.groups`` through model with its user and group fields."""
+    from django.contrib.auth import get_user_model
+
+    field = get_user_model().groups.field
+    return (
+        field.remote_field.through,
+        field.m2m_field_name(),
+        field.m2m_reverse_field_name(),
+    )
+
+
+def prefetch_user_roles(queryset):
+    """Prefetches groups of the users of the queryset.
+
+    Role checks on returned users use the prefetched groups instead of
+    querying the database for each user.
+    """
+    from django.contrib.auth.models import Group
+    from django.db.models import Prefetch
+
+    return queryset.prefetch_related(
+        Prefetch("groups", queryset=Group.objects.only("name"))
+    )
+
+
+def get_roles_for_users(users_or_ids, roles=None, using=None) -> dict:
+    """Returns the names of the roles of many users with a single query.
+
+    Args:
+        users_or_ids (iterable): users, either as instances or primary keys.
+        roles (iterable, optional): roles (or their names) to look for.
+            Defaults to every registered role.
+        using (str, optional): database alias. Defaults to the one chosen by
+            database routers for reading.
+
+    Returns:
+        dict: maps every user primary key to the names of its roles.
+    """
+    from .roles import is_hierarchical, load_roles
+
+    hierarchical = is_hierarchical()
+    registry = load_roles() if roles is None or hierarchical else None
+    if roles is None:
+        names = frozenset(registry)
+    else:
+        names = frozenset(getattr(role, "name", role) for role in roles)
+    # hierarchical roles are held by users of the roles extending them
+    lookup = registry.with_descendants(names) if hierarchical else names
+
+    through, user_field, group_field = get_user_groups_through()
+    pks = {getattr(user, "pk", user) for user in users_or_ids}
+    rows = (
+        through.objects.using(using)
+        .filter(**{f"{user_field}__in": pks, f"{group_field}__name__in": lookup})
+        .values_list(f"{user_field}_id", f"{group_field}__name")
+        .order_by()
+    )
+    result = {pk: set() for pk in pks}
+    for pk, name in rows:
+        result[pk].add(name)
+    if hierarchical:
+        return {
+            pk: registry.with_ancestors(user_names) & names
+            for pk, user_names in result.items()
+        }
+    return {pk: frozenset(user_names) for pk, user_names in result.items()}
+
+
+def users_in_roles(*roles, mode="any", using=None):
+    """Returns a queryset of users belonging to the provided roles.
+
+    Users are filtered on the ``User.groups`` through table using primary
+    keys of role groups, without joining the group table. Hierarchical roles
+    are also held by users of the roles extending them.
+
+    Args:
+        roles: roles (or their names) to look for.
+        mode (str, optional): either "any" to look for users belonging to any
+            role or "all" to look for users belonging to every role.
+            Defaults to "any".
+        using (str, optional): database alias. Defaults to the one chosen by
+            database routers for reading.
+    """
+    from django.contrib.auth import get_user_model
+    from django.db.models import Count
+
+    from .roles import get_role_group_ids, is_hierarchical, load_roles
+
+    if mode not in ("any", "all"):
+        raise ValueError(f'Mode must be either "any" or "all" (but is {mode})')
+
+    User = get_user_model()
+    names = {getattr(role, "name", role) for role in roles}
+    if is_hierarchical():
+        registry = load_roles()
+        lookup = {name: registry.with_descendants([name]) for name in names}
+    else:
+        lookup = {name: {name} for name in names}
+    group_ids = get_role_group_ids(set().union(*lookup.values()), using=using)
+    role_group_ids = {
+        name: [group_ids[group] for group in groups if group in group_ids]
+        for name, groups in lookup.items()
+    }
+    if not group_ids or mode == "all" and not all(role_group_ids.values()):
+        return User.objects.using(using).none()
+
+    through, user_field, group_field = get_user_groups_through()
+    memberships = through.objects.using(using).order_by()
+    users = User.objects.using(using)
+    if mode == "all" and any(len(ids) > 1 for ids in role_group_ids.values()):
+        # users must hold a membership for some group of every role
+        for ids in role_group_ids.values():
+            users = users.filter(
+                pk__in=memberships.filter(**{f"{group_field}_id__in": ids}).values(
+                    f"{user_field}_id"
+                )
+            )
+        return users
+
+    memberships = memberships.filter(**{f"{group_field}_id__in": group_ids.values()})
+    if mode == "all":
+        # users must hold a membership for every group
+        memberships = (
+            memberships.values(user_field)
+            .annotate(roles=Count("pk"))
+            .filter(roles=len(group_ids))
+        )
+    return users.filter(pk__in=memberships.values(f"{user_field}_id"))
@@ -0,0 +1,162 @@
+from time import perf_counter
+from typing import NamedTuple
+
+from django.db import router, transaction
+from django.db.models import Q
+
+from .membership import get_user_groups_through, invalidate_user_roles
+from .roles import get_role_group_ids, load_roles
+from .utils import iter_batches
+
+
+class ReconcileReport(NamedTuple):
+    """Outcome of a role membership reconciliation."""
+
+    users: int
+    added: int
+    removed: int
+    elapsed: float
+
+    @property
+    def throughput(self) -> float:
+        """Reconciled users per second."""
+        return self.users / self.elapsed if self.elapsed else 0.0
+
+
+class _Reconciler:
+    def __init__(self, group_ids, batch_size, using):
+        self.through, user_field, group_field = get_user_groups_through()
+        self.using = using
+        self.user_attr = f"{user_field}_id"
+        self.group_attr = f"{group_field}_id"
+        self.group_ids = group_ids
+        self.batch_size = batch_size
+        self.added = self.removed = 0
+
+    def iter_memberships(self, lower, upper):
+        """Yields current memberships of users in the (lower, upper] range.
+
+        Memberships are read in chunks ordered by user and primary key.
+        """
+        memberships = self.through.objects.using(self.using).filter(
+            **{f"{self.group_attr}__in": self.group_ids.values()}
+        )
+        if upper is not None:
+            memberships = memberships.filter(**{f"{self.user_attr}__lte": upper})
+        user_id, pk = lower, None
+        while True:
+            chunk = memberships
+            if pk is not None:
+                chunk = chunk.filter(
+                    Q(**{f"{self.user_attr}__gt": user_id})
+                    | Q(**{self.user_attr: user_id, "pk__gt": pk})
+                )
+            elif user_id is not None:
+                chunk = chunk.filter(**{f"{self.user_attr}__gt": user_id})
+            chunk = list(
+                chunk.order_by(self.user_attr, "pk").values_list(
+                    "pk", self.user_attr, self.group_attr
+                )[: self.batch_size]
+            )
+            yield from chunk
+            if len(chunk) < self.batch_size:
+                return
+            pk, user_id, _ = chunk[-1]
+
+    def apply(self, lower, upper, desired):
+        """Aligns memberships of users in the (lower, upper] range.
+
+        Users which are not in ``desired`` lose every managed role.
+        """
+        to_remove, changed = [], set()
+        existing = {user_id: set() for user_id in desired}
+        with transaction.atomic(using=self.using):
+            for pk, user_id, group_id in self.iter_memberships(lower, upper):
+                if group_id in desired.get(user_id, ()):
+                    existing[user_id].add(group_id)
+                    continue
+                to_remove.append(pk)
+                changed.add(user_id)
+                if len(to_remove) >= self.batch_size:
+                    self.remove(to_remove)
+                    to_remove = []
+            self.remove(to_remove)
+            to_add = [
+                self.through(**{self.user_attr: user_id, self.group_attr: group_id})
+                for user_id, group_ids in desired.items()
+                for group_id in group_ids - existing[user_id]
+            ]
+            if to_add:
+                self.through.objects.using(self.using).bulk_create(
+                    to_add, batch_size=self.batch_size, ignore_conflicts=True
+                )
+                self.added += len(to_add)
+                changed.update(getattr(row, self.user_attr) for row in to_add)
+            invalidate_user_roles(*changed, using=self.using)
+
+    def remove(self, pks):
+        if pks:
+            self.removed += (
+                self.through.objects.using(self.using).filter(pk__in=pks).delete()[0]
+            )
+
+
+def reconcile_roles(
+    records, roles=None, batch_size=1000, using=None
+) -> ReconcileReport:
+    """Aligns role membership with the one provided by an external source.
+
+    Records are consumed in batches, thus memory usage is bounded by
+    ``batch_size``: for each batch current memberships are read in key
+    ordered chunks and only differences are written. Users without records
+    lose every role, while role names which are not managed are ignored.
+
+    Args:
+        records (iterable): ``(user_id, role_names)`` records, sorted by
+            user primary key with a single record for each user.
+        roles (iterable, optional): roles (or their names) to reconcile.
+            Defaults to every registered role.
+        batch_size (int, optional): number of records (and rows) handled at
+            once. Defaults to 1000.
+        using (str, optional): database alias, memberships are both read and
+            written on it. Defaults to the one chosen by database routers for
+            writing.
+
+    Returns:
+        ReconcileReport: users reconciled, memberships added and removed.
+    """
+    if roles is None:
+        roles = load_roles().values()
+    names = [getattr(role, "name", role) for role in roles]
+    through, _, _ = get_user_groups_through()
+    # memberships are compared with the primary, never with lagging replicas
+    using = using or router.db_for_write(through)
+    reconciler = _Reconciler(
+        get_role_group_ids(names, create=True, using=using), batch_size, using
+    )
+    start = perf_counter()
+    users, previous, last = 0, None, None
+    for batch in iter_batches(records, batch_size):
+        desired = {}
+        for user_id, role_names in batch:
+            if last is not None and user_id <= last:
+                raise ValueError(
+                    f"Records must be sorted by user id ({user_id} follows {last})"
+                )
+            desired[user_id] = {
+                reconciler.group_ids[name]
+                for name in role_names
+                if name in reconciler.group_ids
+            }
+            last = user_id
+        reconciler.apply(lower=previous, upper=last, desired=desired)
+        previous = last
+        users += len(batch)
+    # users following the last record lose every role
+    reconciler.apply(lower=last, upper=None, desired={})
+    return ReconcileReport(
+        users=users,
+        added=reconciler.added,
+        removed=reconciler.removed,
+        elapsed=perf_counter() - start,
+    )
@@ -1,57 +1,413 @@
-import inspect
-from functools import partialmethod, reduce
+import threading
+from collections import defaultdict
+from collections.abc import Mapping
+from functools import partialmethod, update_wrapper
 from importlib import import_module
+from types import MappingProxyType, MethodType
+from typing import NamedTuple
 
+from asgiref.sync import sync_to_async
 from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
 from django.utils.functional import cached_property
 
-from .signals import post_role_setup, pre_role_setup
-from .utils import get_permission, map_permissions
+from .instrumentation import increment, timed
+from .membership import (
+    ainvalidate_user_roles,
+    get_user_groups_through,
+    invalidate_user_roles,
+)
+from .signals import asend, post_role_setup, pre_role_setup
+from .utils import (
+    PermissionMap,
+    PermissionsDiff,
+    aget_permissions,
+    diff_permissions,
+    exclude_permissions,
+    get_permission_name,
+    get_permissions,
+    get_wildcard_permissions,
+    iter_batches,
+    matches_wildcards,
+    merge_permission_maps,
+    normalize_permissions,
+)
 
 
-class _RoleRegistry(dict):
+class _hybridmethod:
+    """Method bound to the instance it is accessed from, or to its class."""
+
+    def __init__(self, func):
+        self.func = func
+        update_wrapper(self, func)
+
+    def __get__(self, instance, owner=None):
+        return MethodType(self.func, owner if instance is None else instance)
+
+
+class _RegistrySnapshot(NamedTuple):
+    """Immutable state of the role registry."""
+
+    roles: MappingProxyType
+    # reverse index of permissions to the names of roles granting them
+    perm_roles: MappingProxyType
+    # names of roles granting wildcards, by app label and model
+    wildcard_roles: MappingProxyType
+    # names of registered roles extended by each role (and of roles extending
+    # it), including the role itself
+    ancestors: MappingProxyType
+    descendants: MappingProxyType
+    # permissions not inherited from registered roles, by role name
+    own_permissions: MappingProxyType
+
+    @classmethod
+    def build(cls, roles: dict) -> "_RegistrySnapshot":
+        perm_roles = defaultdict(set)
+        wildcard_roles = defaultdict(lambda: defaultdict(set))
+        for name, role in roles.items():
+            for perm in role._perm_index:
+                perm_roles[perm].add(name)
+            for app_label, models in role._perm_wildcards.items():
+                for modelname in models:
+                    wildcard_roles[app_label][modelname].add(name)
+
+        role_names = {role: name for name, role in roles.items()}
+        ancestors, descendants = {}, defaultdict(set)
+        own_permissions = {}
+        for name, role in roles.items():
+            ancestors[name] = frozenset(
+                role_names[base] for base in role.__mro__ if base in role_names
+            )
+            for ancestor in ancestors[name]:
+                descendants[ancestor].add(name)
+            own_permissions[name] = exclude_permissions(
+                role._permissions,
+                *(roles[base]._permissions for base in ancestors[name] - {name}),
+            )
+        return cls(
+            roles=MappingProxyType(dict(roles)),
+            perm_roles=MappingProxyType(
+                {perm: frozenset(names) for perm, names in perm_roles.items()}
+            ),
+            wildcard_roles=MappingProxyType(
+                {
+                    app_label: {
+                        modelname: frozenset(names)
+                        for modelname, names in models.items()
+                    }
+                    for app_label, models in wildcard_roles.items()
+                }
+            ),
+            ancestors=MappingProxyType(ancestors),
+            descendants=MappingProxyType(
+                {name: frozenset(names) for name, names in descendants.items()}
+            ),
+            own_permissions=MappingProxyType(own_permissions),
+        )
+
+
+class _RoleRegistry(Mapping):
+    """Thread-safe registry of roles by name.
+
+    Readers always access an immutable snapshot, which is built again (under
+    a lock) after roles are changed, thus they never see partial changes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._lock = threading.RLock()
+        self._roles = {}
+        self._snapshot = _RegistrySnapshot.build({})
+        self._loaded = False
+        self.update(*args, **kwargs)
+
+    def _get_snapshot(self) -> _RegistrySnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is None:
+                    snapshot = self._snapshot = _RegistrySnapshot.build(self._roles)
+        return snapshot
+
+    def __getitem__(self, k):
+        return self._get_snapshot().roles[k]
+
+    def __iter__(self):
+        return iter(self._get_snapshot().roles)
+
+    def __len__(self):
+        return len(self._get_snapshot().roles)
+
+    def __contains__(self, k):
+        return k in self._get_snapshot().roles
+
+    def keys(self):
+        return self._get_snapshot().roles.keys()
+
+    def values(self):
+        return self._get_snapshot().roles.values()
+
+    def items(self):
+        return self._get_snapshot().roles.items()
+
     def __delitem__(self, v):
         raise NotImplementedError
 
     def __setitem__(self, k, v):
-        if k in self:
-            raise ValueError(f"{k} already bound to role registry")
-        super().__setitem__(k, v)
+        self.update({k: v})
+
+    def __deepcopy__(self, memo):
+        registry = self.__class__(self)
+        registry._loaded = self._loaded
+        return registry
+
+    def update(self, *args, **kwargs):
+        with self._lock:
+            roles = dict(*args, **kwargs)
+            for k, v in roles.items():
+                if k in self._roles and not _is_redeclaration(self._roles[k], v):
+                    raise ValueError(f"{k} already bound to role registry")
+            self._roles.update(roles)
+            # snapshot is built again upon next read
+            self._snapshot = None
+
+    def replace(self, roles: dict):
+        """Atomically replaces every registered role."""
+        snapshot = _RegistrySnapshot.build(roles)
+        with self._lock:
+            self._roles = dict(roles)
+            self._snapshot = snapshot
+
+    def clear(self):
+        self.replace({})
+
+    def roles_with_perm(self, perm: str) -> frozenset:
+        snapshot = self._get_snapshot()
+        names = snapshot.perm_roles.get(perm, frozenset())
+        app_label, _, _ = perm.partition(".")
+        models = snapshot.wildcard_roles.get(app_label)
+        if models:
+            # roles granting the permission through wildcards
+            names = names.union(
+                *(
+                    wildcard_names
+                    for modelname, wildcard_names in models.items()
+                    if perm in get_wildcard_permissions(app_label, modelname)
+                )
+            )
+        return names
+
+    def with_ancestors(self, names) -> frozenset:
+        """Returns the provided role names along with the ones they extend."""
+        ancestors = self._get_snapshot().ancestors
+        return frozenset(names).union(
+            *(ancestors[name] for name in names if name in ancestors)
+        )
+
+    def with_descendants(self, names) -> frozenset:
+        """Returns the provided role names along with the ones extending them."""
+        descendants = self._get_snapshot().descendants
+        return frozenset(names).union(
+            *(descendants[name] for name in names if name in descendants)
+        )
+
+    def get_own_permissions(self, role) -> PermissionMap:
+        """Returns permissions of the role not inherited from registered roles.
+
+        Roles which are not registered are returned every permission.
+        """
+        snapshot = self._get_snapshot()
+        if snapshot.roles.get(role.name) is not role:
+            return role._permissions
+        return snapshot.own_permissions[role.name]
+
+
+def is_hierarchical() -> bool:
+    """Whether roles are hierarchical, as set by ``ROLES_HIERARCHICAL``.
+
+    Users of hierarchical roles are treated as holding the registered roles
+    they extend too, thus groups are only bound to their own permissions.
+    """
+    from django.conf import settings
+
+    return getattr(settings, "ROLES_HIERARCHICAL", False)
 
 
 # registry which stores the list of available roles
 registry = _RoleRegistry()
-registry._loaded = False
+
+
+class _GroupIdCache:
+    """Process-wide, thread-safe cache of role group primary keys by name.
+
+    Primary keys are cached by database alias once the transaction which
+    loaded them is committed, thus groups loaded (or created) by rolled back
+    transactions are never cached. Entries are invalidated when groups are
+    saved or deleted.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_db(using, create):
+        from django.contrib.auth.models import Group
+        from django.db import router
+
+        if using:
+            return using
+        # groups are created on the primary, but otherwise read from replicas
+        return router.db_for_write(Group) if create else router.db_for_read(Group)
+
+    def _split(self, names, using) -> tuple:
+        """Returns cached primary keys, missing names and names to look up."""
+        names, ids = list(names), self._ids.get(using, {})
+        group_ids = {name: ids[name] for name in names if name in ids}
+        missing = [name for name in names if name not in group_ids]
+        # load every registered role group along with the requested ones
+        lookup = set(missing).union(name for name in registry if name not in ids)
+        return group_ids, missing, lookup
+
+    def get_many(self, names, create=False, using=None) -> dict:
+        from django.contrib.auth.models import Group
+
+        using = self._get_db(using, create)
+        group_ids, missing, lookup = self._split(names, using)
+        if not missing:
+            increment("group_ids.cache.hit")
+            return group_ids
+        increment("group_ids.cache.miss")
+
+        manager = Group.objects.db_manager(using)
+        loaded = dict(manager.filter(name__in=lookup).values_list("name", "pk"))
+        to_create = [name for name in missing if name not in loaded]
+        if create and to_create:
+            manager.bulk_create(
+                (Group(name=name) for name in to_create), ignore_conflicts=True
+            )
+            loaded.update(manager.filter(name__in=to_create).values_list("name", "pk"))
+        transaction.on_commit(lambda: self.update(loaded, using), using=using)
+        group_ids.update((name, loaded[name]) for name in missing if name in loaded)
+        return group_ids
+
+    async def aget_many(self, names, create=False, using=None) -> dict:
+        from django.contrib.auth.models import Group
+
+        using = self._get_db(using, create)
+        group_ids, missing, lookup = self._split(names, using)
+        if not missing:
+            increment("group_ids.cache.hit")
+            return group_ids
+        increment("group_ids.cache.miss")
+
+        manager = Group.objects.db_manager(using)
+        groups = manager.values_list("name", "pk")
+        loaded = {name: pk async for name, pk in groups.filter(name__in=lookup)}
+        to_create = [name for name in missing if name not in loaded]
+        if create and to_create:
+            await manager.abulk_create(
+                (Group(name=name) for name in to_create), ignore_conflicts=True
+            )
+            loaded.update(
+                {name: pk async for name, pk in groups.filter(name__in=to_create)}
+            )
+        # async queries run on the connection of the calling thread, thus
+        # possibly within its transaction
+        await sync_to_async(transaction.on_commit)(
+            lambda: self.update(loaded, using), using=using
+        )
+        group_ids.update((name, loaded[name]) for name in missing if name in loaded)
+        return group_ids
+
+    def update(self, group_ids, using):
+        with self._lock:
+            self._ids = {**self._ids, using: {**self._ids.get(using, {}), **group_ids}}
+
+    def invalidate(self, pk):
+        with self._lock:
+            # replicas share primary keys, thus every database is invalidated
+            self._ids = {
+                using: {name: id for name, id in ids.items() if id != pk}
+                for using, ids in self._ids.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._ids = {}
+
+
+_group_ids = _GroupIdCache()
+
+
+def get_role_group_ids(names, create=False, using=None) -> dict:
+    """Returns primary keys of groups of the provided roles, by name.
+
+    Args:
+        names (iterable): role names.
+        create (bool, optional): If passed as True also creates missing
+            groups, otherwise they are not returned. Defaults to False.
+        using (str, optional): database alias. Defaults to the one chosen
+            by database routers for writing, if ``create`` is True, or for
+            reading otherwise.
+    """
+    return _group_ids.get_many(names, create, using)
+
+
+def group_changed(sender, instance, **kwargs):
+    """Invalidates the cached primary key of a saved or deleted group."""
+    _group_ids.invalidate(instance.pk)
+
+
+# concrete roles by the name of the module which declares them
+_declared_roles = defaultdict(dict)
+
+
+def _is_redeclaration(current, role) -> bool:
+    """Tells whether ``role`` declares ``current`` again (i.e. module reload)."""
+    return (current.__module__, current.__qualname__) == (
+        role.__module__,
+        role.__qualname__,
+    )
 
 
 class RegisterRoleMeta(type):
     @classmethod
     def _get_declared_permissions(cls, bases, classdict):
-        permissions = classdict.get("permissions", ())
-        # merge permissions with base classes
-        permissions = [permissions]
-        if bases:
-            permissions = reduce(
-                lambda a, b: a + [getattr(b, "_permissions", None)],
-                bases,
-                permissions,
-            )
-        permissions = map_permissions(*permissions)
+        # merged permissions of base classes are memoized by the tuple of
+        # bases, thus each class only normalizes its own declaration
+        inherited = merge_permission_maps(
+            *(getattr(base, "_permissions", None) for base in bases)
+        )
+        permissions = merge_permission_maps(
+            normalize_permissions(classdict.get("permissions", ())), inherited
+        )
         assert not bases or permissions, "A Role must specify at least 1 permission"
         return permissions
 
-    def __new__(cls, classname, bases, classdict, **kwargs):
+    def __new__(cls, classname, bases, classdict, register=True, **kwargs):
         name = classdict.get("name", None)
         assert (
             not bases or isinstance(name, str) and name
         ), "Role name must not be empty"
-        classdict["_permissions"] = cls._get_declared_permissions(bases, classdict)
+        permissions = classdict.get("_permissions")
+        if permissions is None:
+            permissions = cls._get_declared_permissions(bases, classdict)
+        else:
+            # precomputed permissions
+            permissions = PermissionMap(permissions)
+        classdict["_permissions"] = permissions
+        # precompiled "app_label.codename" permissions
+        classdict["_perm_index"] = permissions.names
+        # wildcards are checked by app label and model
+        classdict["_perm_wildcards"] = permissions.wildcards
         # stop inheritance of abstractness
         is_abstract = classdict.setdefault("abstract", False)
         role_class = super().__new__(cls, classname, bases, classdict, **kwargs)
-        if not is_abstract:
+        if not is_abstract and register:
             # add role to register
             registry[role_class.name] = role_class
+            _declared_roles[role_class.__module__][role_class.name] = role_class
 
         return role_class
 
@@ -63,94 +419,386 @@ class Role(metaclass=RegisterRoleMeta):
     permissions: dict | list | tuple = ()
     abstract = True
 
-    @cached_property
-    def group(self):
+    def __init__(self, using=None):
+        # database alias of the role group, routers choose it if not provided
+        self.using = using
+
+    def _build_group(self, pk, using):
         from django.contrib.auth.models import Group
 
-        group, _created = Group.objects.get_or_create(name=self.name)
+        group = Group(pk=pk, name=self.name)
+        # flag group as loaded from the database
+        group._state.adding = False
+        group._state.db = using
         return group
 
+    def _get_group_db(self):
+        from django.contrib.auth.models import Group
+        from django.db import router
+
+        # the group is used to write memberships and permissions
+        return self.using or router.db_for_write(Group)
+
+    @cached_property
+    def group(self):
+        using = self._get_group_db()
+        group_ids = get_role_group_ids([self.name], create=True, using=using)
+        return self._build_group(group_ids[self.name], using)
+
+    async def aget_group(self):
+        """Async version of ``group``, sharing the same caches."""
+        if "group" not in self.__dict__:
+            using = self._get_group_db()
+            group_ids = await _group_ids.aget_many(
+                [self.name], create=True, using=using
+            )
+            self.__dict__["group"] = self._build_group(group_ids[self.name], using)
+        return self.__dict__["group"]
+
     @classmethod
-    def iter_perms(cls):
-        for app_label, app_perms in cls._permissions.items():
-            for modelname, perms in app_perms.items():
-                for perm in sorted(perms):
-                    yield get_permission(perm, app_label, modelname)
+    def get_bound_permissions(cls) -> PermissionMap:
+        """Returns the permissions to bind to the role group.
+
+        Hierarchical roles are only bound to the permissions which are not
+        inherited from registered roles, otherwise every permission is bound.
+        """
+        if is_hierarchical():
+            return registry.get_own_permissions(cls)
+        return cls._permissions
 
-    def setup_permissions(self, clear=False):
+    @classmethod
+    def iter_perms(cls, using=None):
+        # every permission is resolved using a single query
+        yield from get_permissions(cls.get_bound_permissions(), using=using).values()
+
+    @staticmethod
+    def _get_current_permissions_queryset(group):
+        from django.contrib.auth.models import Permission
+
+        return (
+            Permission.objects.using(group._state.db)
+            .filter(group=group)
+            .order_by()
+            .values_list("pk", "content_type__app_label", "codename")
+        )
+
+    def get_current_permissions(self) -> dict:
+        """Returns permissions bound to this role group, mapping pks to names."""
+        perms = self._get_current_permissions_queryset(self.group)
+        return {pk: f"{app_label}.{codename}" for pk, app_label, codename in perms}
+
+    async def aget_current_permissions(self) -> dict:
+        """Async version of ``get_current_permissions``."""
+        perms = self._get_current_permissions_queryset(await self.aget_group())
+        return {
+            pk: f"{app_label}.{codename}" async for pk, app_label, codename in perms
+        }
+
+    def setup_permissions(self, clear=False) -> PermissionsDiff:
         """Assignes declared permissions to this role group.
 
+        Declared permissions are compared with the ones already bound to the
+        group and only missing (or exceeding) ones are written to the
+        database, ``m2m_changed`` signals are not sent.
+
         Args:
             clear (bool, optional): If passed as True also clears existing
                 permissions bound to this role. Defaults to False.
+
+        Returns:
+            PermissionsDiff: added, removed and unchanged permissions.
         """
         pre_role_setup.send(self.__class__, role=self, clear=clear)
-        if clear:
-            self.group.permissions.set(self.iter_perms())
-        else:
-            self.group.permissions.add(*self.iter_perms())
-        post_role_setup.send(self.__class__, role=self)
+        with timed(
+            "role.setup_permissions", using=self._get_group_db(), role=self.name
+        ):
+            group = self.group
+            declared = {
+                perm.pk: get_permission_name(perm)
+                for perm in self.iter_perms(using=group._state.db)
+            }
+            result, added, removed = diff_permissions(
+                declared, self.get_current_permissions(), clear
+            )
+            if added or removed:
+                self._write_permissions(group, added, removed)
+        post_role_setup.send(self.__class__, role=self, result=result)
+        return result
+
+    async def asetup_permissions(self, clear=False) -> PermissionsDiff:
+        """Async version of ``setup_permissions``."""
+        await asend(pre_role_setup, self.__class__, role=self, clear=clear)
+        group = await self.aget_group()
+        declared = {
+            perm.pk: get_permission_name(perm)
+            for perm in (
+                await aget_permissions(
+                    self.get_bound_permissions(), using=group._state.db
+                )
+            ).values()
+        }
+        result, added, removed = diff_permissions(
+            declared, await self.aget_current_permissions(), clear
+        )
+        if added or removed:
+            # writes happen within a transaction, thus in a sync context
+            await sync_to_async(self._write_permissions)(group, added, removed)
+        await asend(post_role_setup, self.__class__, role=self, result=result)
+        return result
+
+    @staticmethod
+    def _write_permissions(group, added, removed):
+        through = group.permissions.through
+        manager = through.objects.db_manager(group._state.db)
+        with transaction.atomic(using=manager.db):
+            if removed:
+                manager.filter(group_id=group.pk, permission_id__in=removed).delete()
+            if added:
+                # permissions may be concurrently bound by other processes
+                manager.bulk_create(
+                    (through(group_id=group.pk, permission_id=pk) for pk in added),
+                    ignore_conflicts=True,
+                )
 
     # wrappers for group methods
-    def _wrap_group_method(self, method, *args, **kwargs):
-        method = getattr(self.group.user_set, method)
-        return method(*args, **kwargs)
+    def _wrap_group_method(self, *args, method, **kwargs):
+        with timed(f"role.{method}", using=self._get_group_db(), role=self.name):
+            result = getattr(self.group.user_set, method)(*args, **kwargs)
+        # drop cached membership of involved users
+        using = self.group._state.db
+        if method == "set":
+            users = kwargs.get("objs", args[0] if args else ())
+            invalidate_user_roles(*users, using=using)
+        else:
+            invalidate_user_roles(*args, using=using)
+        return result
 
     add = partialmethod(_wrap_group_method, method="add")
     remove = partialmethod(_wrap_group_method, method="remove")
     set = partialmethod(_wrap_group_method, method="set")
     clear = partialmethod(_wrap_group_method, method="clear")
 
+    async def _awrap_group_method(self, *args, method, **kwargs):
+        group = await self.aget_group()
+        result = await getattr(group.user_set, f"a{method}")(*args, **kwargs)
+        # drop cached membership of involved users
+        using = group._state.db
+        if method == "set":
+            users = kwargs.get("objs", args[0] if args else ())
+            await ainvalidate_user_roles(*users, using=using)
+        else:
+            await ainvalidate_user_roles(*args, using=using)
+        return result
+
+    aadd = partialmethod(_awrap_group_method, method="add")
+    aremove = partialmethod(_awrap_group_method, method="remove")
+    aset = partialmethod(_awrap_group_method, method="set")
+    aclear = partialmethod(_awrap_group_method, method="clear")
+
+    # bulk user assignment, writing directly to the through table
+    def _write_users(self, action, pks, send_signals, users=()):
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import m2m_changed
+
+        through, user_field, group_field = get_user_groups_through()
+        manager = through.objects.db_manager(self.group._state.db)
+        signal_kwargs = {
+            "sender": through,
+            "instance": self.group,
+            "reverse": True,
+            "model": get_user_model(),
+            "pk_set": pks,
+            "using": manager.db,
+        }
+        if send_signals:
+            m2m_changed.send(action=f"pre_{action}", **signal_kwargs)
+        with timed(f"role.bulk_{action}", using=manager.db, role=self.name):
+            if action == "add":
+                manager.bulk_create(
+                    (
+                        through(
+                            **{
+                                f"{user_field}_id": pk,
+                                f"{group_field}_id": self.group.pk,
+                            }
+                        )
+                        for pk in pks
+                    ),
+                    ignore_conflicts=True,
+                )
+                count = len(pks)
+            else:
+                count, _ = manager.filter(
+                    **{f"{user_field}_id__in": pks, f"{group_field}_id": self.group.pk}
+                ).delete()
+        if send_signals:
+            m2m_changed.send(action=f"post_{action}", **signal_kwargs)
+        invalidate_user_roles(*pks, *users, using=manager.db)
+        return count
+
+    def _get_user_ids(self, user_ids=None) -> set:
+        through, user_field, group_field = get_user_groups_through()
+        memberships = through.objects.using(self.group._state.db).filter(
+            **{f"{group_field}_id": self.group.pk}
+        )
+        if user_ids is not None:
+            memberships = memberships.filter(**{f"{user_field}_id__in": user_ids})
+        return set(memberships.values_list(f"{user_field}_id", flat=True))
+
+    def bulk_add(self, user_ids, batch_size=1000, send_signals=False) -> int:
+        """Adds many users to this role, returning how many were added.
+
+        Users (either instances or primary keys) are added in batches
+        directly to the through table, ``m2m_changed`` signals are sent only
+        if ``send_signals`` is passed as True.
+        """
+        added = 0
+        for batch in iter_batches(user_ids, batch_size):
+            pks = {getattr(user, "pk", user) for user in batch}
+            pks -= self._get_user_ids(pks)
+            if pks:
+                added += self._write_users("add", pks, send_signals, batch)
+        return added
+
+    def bulk_remove(self, user_ids, batch_size=1000, send_signals=False) -> int:
+        """Removes many users from this role, returning how many were removed.
+
+        Arguments are the same of ``bulk_add``.
+        """
+        removed = 0
+        for batch in iter_batches(user_ids, batch_size):
+            pks = {getattr(user, "pk", user) for user in batch}
+            removed += self._write_users("remove", pks, send_signals, batch)
+        return removed
+
+    def bulk_set(self, user_ids, batch_size=1000, send_signals=False) -> tuple:
+        """Sets users of this role, returning how many were added and removed.
+
+        Arguments are the same of ``bulk_add``.
+        """
+        user_ids = list(user_ids)
+        pks = {getattr(user, "pk", user) for user in user_ids}
+        current = self._get_user_ids()
+        removed = 0
+        for batch in iter_batches(current - pks, batch_size):
+            removed += self._write_users("remove", set(batch), send_signals)
+        added = 0
+        for batch in iter_batches(pks - current, batch_size):
+            added += self._write_users("add", set(batch), send_signals)
+        # drop membership cached on provided instances
+        invalidate_user_roles(
+            *(user for user in user_ids if hasattr(user, "pk")),
+            using=self.group._state.db,
+        )
+        return added, removed
+
+    @_hybridmethod
+    def users(role, using=None):
+        """Returns a queryset of users belonging to this role.
+
+        Hierarchical roles also return users of the roles extending them.
+        When called on a role instance users are read from its database,
+        unless ``using`` is provided.
+        """
+        from .membership import users_in_roles
+
+        if using is None and isinstance(role, Role):
+            using = role.using
+        return users_in_roles(role, using=using)
+
     def has_perm(self, perm: str) -> bool:
-        # split perm in app and codename
-        app_label, codename = perm.split(".", 1)
-        if app_label in self._permissions:
-            # just check if codename is in any model permission for provided app
-            return any(
-                codename in perms for perms in self._permissions[app_label].values()
-            )
-        return False
+        if perm in self._perm_index:
+            return True
+        return bool(self._perm_wildcards) and matches_wildcards(
+            perm, self._perm_wildcards
+        )
 
     def has_perms(self, *perms) -> bool:
-        return all(self.has_perm(p) for p in perms)
+        if not self._perm_wildcards:
+            return self._perm_index.issuperset(perms)
+        return all(map(self.has_perm, perms))
 
     def has_any_perm(self, *perms) -> bool:
-        return any(self.has_perm(p) for p in perms)
+        if not self._perm_wildcards:
+            return not self._perm_index.isdisjoint(perms)
+        return any(map(self.has_perm, perms))
+
+
+def roles_with_perm(perm: str) -> frozenset:
+    """Returns the names of registered roles granting the provided permission."""
+    return registry.roles_with_perm(perm)
 
 
 def load_roles(*, force=False, clear=False) -> _RoleRegistry:
-    """Force roles to be loaded and returns the updated role registry."""
+    """Force roles to be loaded and returns the updated role registry.
+
+    Roles declared in ``ROLES_MODULE`` (or in its submodules) are registered
+    by the role metaclass, thus loading them only requires the module to be
+    imported. Roles declared in the ``ROLES_FILE`` data file are built by
+    ``load_role_file`` and replace the ones loaded from the same file before.
+    """
     from django.conf import settings
 
+    # avoid to reload the registry if not needed
+    if registry._loaded and not force:
+        return registry
+
     role_module = getattr(settings, "ROLES_MODULE", None)
-    if not role_module:
+    role_file = getattr(settings, "ROLES_FILE", None)
+    if not role_module and not role_file:
         raise ImproperlyConfigured(
-            "ROLES_MODULE settings is required to correctly load roles!"
+            "ROLES_MODULE (or ROLES_FILE) settings is required to correctly "
+            "load roles!"
         )
 
-    # avoid to reload the registry if not needed
-    if force or not registry._loaded:
-        if clear:
-            registry.clear()
-
+    imported = None
+    if role_module:
         try:
-            mod = import_module(role_module)
+            imported = import_module(role_module)
         except ImportError:
             raise ImproperlyConfigured(
                 f"No module {role_module} from which import roles found!"
             )
+    if role_file:
+        from . import declarative
 
-        # get roles by inspecting module
-        for name, candidate in inspect.getmembers(mod, inspect.isclass):
-            if (
-                issubclass(candidate, Role)
-                and candidate.name not in registry
-                # do not register abstract roles
-                and not candidate.abstract
-                # avoid base class to be added to registry
-                and candidate is not Role
-            ):
-                registry[candidate.name] = candidate
+        file_roles = declarative.load_role_file(role_file)
 
-        registry._loaded = True
+    with registry._lock:
+        # roles declared in the module, either registered upon import or not
+        roles = {} if clear else dict(registry)
+        for module, declared in list(_declared_roles.items()):
+            if role_module and (
+                module == role_module or module.startswith(f"{role_module}.")
+            ):
+                for role in list(declared.values()):
+                    current = roles.setdefault(role.name, role)
+                    if _is_redeclaration(current, role):
+                        # classes of reloaded modules supersede the old ones
+                        roles[role.name] = role
+        if imported is not None:
+            # roles imported into the module from other ones
+            for candidate in vars(imported).values():
+                if (
+                    isinstance(candidate, type)
+                    and issubclass(candidate, Role)
+                    and not candidate.abstract
+                ):
+                    current = roles.setdefault(candidate.name, candidate)
+                    if _is_redeclaration(current, candidate):
+                        roles[candidate.name] = candidate
+        if role_file:
+            # roles built from previous versions of the file are superseded
+            roles = {
+                name: role
+                for name, role in roles.items()
+                if role.__module__ != declarative.__name__
+            }
+            for name in file_roles:
+                if name in roles:
+                    raise ValueError(f"{name} already bound to role registry")
+            roles.update(file_roles)
+        # readers never see a partially loaded registry
+        registry.replace(roles)
+    registry._loaded = True
     return registry
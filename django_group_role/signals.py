@@ -1,4 +1,12 @@
+from asgiref.sync import sync_to_async
 from django.dispatch import Signal
 
 pre_role_setup = Signal()
 post_role_setup = Signal()
+
+
+async def asend(signal, sender, **named):
+    """Sends a signal from async code, also with Django versions before 5.0."""
+    if hasattr(signal, "asend"):
+        return await signal.asend(sender, **named)
+    return await sync_to_async(signal.send)(sender, **named)
@@ -0,0 +1,229 @@
+from contextlib import nullcontext
+from typing import NamedTuple
+
+from django.db import router, transaction
+
+from .exceptions import BadRoleException
+from .instrumentation import get_collector
+from .roles import _group_ids, load_roles
+from .signals import post_role_setup, pre_role_setup
+from .utils import (
+    Measure,
+    PermissionsDiff,
+    _resolve_role_permissions,
+    diff_permissions,
+    get_permission_name,
+    iter_permission_keys,
+)
+
+
+class RoleSyncResult(NamedTuple):
+    """Outcome of the synchronization of a single role."""
+
+    name: str
+    created: bool
+    diff: PermissionsDiff | None = None
+    error: BadRoleException | None = None
+    elapsed: float = 0.0
+    queries: int = 0
+
+
+class SyncReport(NamedTuple):
+    """Outcome of the synchronization of every role.
+
+    Timings and query counts of each phase (``groups``, ``permissions``,
+    ``current`` and ``write``) are stored by phase name.
+    """
+
+    roles: dict
+    elapsed: dict
+    queries: dict
+
+    @property
+    def errors(self) -> dict:
+        return {name: res.error for name, res in self.roles.items() if res.error}
+
+    def as_dict(self) -> dict:
+        """Returns the report as a JSON serializable dict."""
+        return {
+            "roles": {
+                name: {
+                    "created": result.created,
+                    "added": sorted(result.diff.added) if result.diff else [],
+                    "removed": sorted(result.diff.removed) if result.diff else [],
+                    "errors": list(result.error.permissions) if result.error else [],
+                }
+                for name, result in self.roles.items()
+            },
+            "elapsed": self.elapsed,
+            "queries": self.queries,
+        }
+
+
+def _get_groups(names, using, create=True) -> tuple[dict, set]:
+    """Returns groups by name together with the names of the missing ones.
+
+    Missing groups are created unless ``create`` is False.
+    """
+    from django.contrib.auth.models import Group
+
+    manager = Group.objects.db_manager(using)
+    groups = {group.name: group for group in manager.filter(name__in=names)}
+    missing = [name for name in names if name not in groups]
+    if missing and create:
+        created = manager.bulk_create(Group(name=name) for name in missing)
+        if any(group.pk is None for group in created):
+            # backend unable to return primary keys
+            created = manager.filter(name__in=missing)
+        groups.update((group.name, group) for group in created)
+    group_ids = {name: group.pk for name, group in groups.items()}
+    transaction.on_commit(lambda: _group_ids.update(group_ids, using), using=using)
+    return groups, set(missing)
+
+
+def _get_current_permissions(groups, using) -> dict:
+    """Returns the through rows of the provided groups, by group pk."""
+    from django.contrib.auth.models import Group
+
+    through = Group.permissions.through
+    rows = (
+        through.objects.using(using)
+        .filter(group_id__in=[group.pk for group in groups])
+        .values_list(
+            "pk",
+            "group_id",
+            "permission_id",
+            "permission__content_type__app_label",
+            "permission__codename",
+        )
+    )
+    current = {group.pk: {} for group in groups}
+    for pk, group_id, perm_id, app_label, codename in rows:
+        current[group_id][perm_id] = (pk, f"{app_label}.{codename}")
+    return current
+
+
+def _sync(roles, clear, using, dry_run) -> SyncReport:
+    from django.contrib.auth.models import Group
+
+    if using is None:
+        using = router.db_for_write(Group)
+    if roles is None:
+        roles = load_roles().values()
+    roles = [role(using=using) for role in roles]
+    # hierarchical roles are only bound to their own permissions
+    perm_maps = {role.name: role.get_bound_permissions() for role in roles}
+    phases = ("groups", "permissions", "current", "write")
+    measures = {phase: Measure(using) for phase in phases}
+    role_measures = {role.name: Measure(using) for role in roles}
+    diffs = {}
+    with nullcontext() if dry_run else transaction.atomic(using=using):
+        with measures["groups"]:
+            groups, created = _get_groups(
+                [role.name for role in roles], using, create=not dry_run
+            )
+        for role in roles:
+            if role.name in groups:
+                # avoid the role to query its own group
+                role.__dict__["group"] = groups[role.name]
+            if not dry_run:
+                with role_measures[role.name]:
+                    pre_role_setup.send(role.__class__, role=role, clear=clear)
+
+        with measures["permissions"]:
+            # wildcards are expanded with a single query
+            perm_maps, resolved, errors = _resolve_role_permissions(perm_maps, using)
+
+        valid = [role for role in roles if role.name not in errors]
+        with measures["current"]:
+            current = _get_current_permissions(
+                [groups[role.name] for role in valid if role.name in groups], using
+            )
+
+        through = Group.permissions.through
+        to_add, to_remove = [], []
+        for role in valid:
+            with role_measures[role.name]:
+                declared = {
+                    resolved[key].pk: get_permission_name(resolved[key])
+                    for key in iter_permission_keys(perm_maps[role.name])
+                }
+                group = groups.get(role.name)
+                bound = current[group.pk] if group else {}
+                diffs[role.name], added, removed = diff_permissions(
+                    declared, {pk: name for pk, (_, name) in bound.items()}, clear
+                )
+                if not dry_run:
+                    to_add.extend(
+                        through(group_id=group.pk, permission_id=pk) for pk in added
+                    )
+                    to_remove.extend(bound[pk][0] for pk in removed)
+
+        with measures["write"]:
+            if to_remove:
+                through.objects.using(using).filter(pk__in=to_remove).delete()
+            if to_add:
+                through.objects.using(using).bulk_create(to_add, ignore_conflicts=True)
+
+        if not dry_run:
+            for role in valid:
+                with role_measures[role.name]:
+                    post_role_setup.send(
+                        role.__class__, role=role, result=diffs[role.name]
+                    )
+
+    collector = get_collector()
+    if collector is not None:
+        tags = {"database": using, "dry_run": str(dry_run).lower()}
+        for phase, measure in measures.items():
+            collector.timing(f"sync.{phase}", measure.elapsed, tags)
+            collector.increment(f"sync.{phase}.queries", measure.queries, tags)
+        collector.increment("sync.errors", len(errors), tags)
+
+    return SyncReport(
+        roles={
+            role.name: RoleSyncResult(
+                name=role.name,
+                created=role.name in created,
+                diff=diffs.get(role.name),
+                error=errors.get(role.name),
+                elapsed=role_measures[role.name].elapsed,
+                queries=role_measures[role.name].queries,
+            )
+            for role in roles
+        },
+        elapsed={phase: measure.elapsed for phase, measure in measures.items()},
+        queries={phase: measure.queries for phase, measure in measures.items()},
+    )
+
+
+def sync_roles(roles=None, clear=False, using=None) -> SyncReport:
+    """Synchronizes role groups and permissions in bulk.
+
+    Missing groups are created with a single query, every declared permission
+    is resolved with a single query and then only differences are written to
+    the through table, everything within a single transaction. Roles with
+    bad permissions are reported, but do not prevent other roles setup.
+
+    Args:
+        roles (iterable, optional): roles to synchronize. Defaults to every
+            registered role.
+        clear (bool, optional): If passed as True also clears existing
+            permissions bound to roles. Defaults to False.
+        using (str, optional): database alias. Defaults to the one groups
+            are routed to for writes.
+
+    Returns:
+        SyncReport: the outcome of each role and timings.
+    """
+    return _sync(roles, clear, using, dry_run=False)
+
+
+def plan_roles(roles=None, clear=False, using=None) -> SyncReport:
+    """Computes what ``sync_roles`` would change without writing anything.
+
+    The plan is computed with three queries, no matter how many roles are
+    provided. Roles whose group does not exist yet are reported as created.
+    Arguments are the same of ``sync_roles``.
+    """
+    return _sync(roles, clear, using, dry_run=True)
@@ -1,14 +1,117 @@
+from django.db import router
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
 from django.test import override_settings
-from .exceptions import BadRoleException
-from .roles import load_roles, registry
+from .roles import is_hierarchical, load_roles, registry
+from .sync import _get_groups
+from .utils import _resolve_role_permissions, iter_permission_keys
+
+# permission primary keys of roles, by database, role classes and hierarchy
+_snapshots = {}
+
+
+@receiver(post_migrate)
+def _clear_snapshots(**kwargs):
+    # permissions may be created again (i.e. by flushing the database)
+    _snapshots.clear()
+
+
+def _get_snapshot(roles, using) -> tuple[dict, dict]:
+    """Returns the primary keys of permissions of every role, by name.
+
+    Wildcards are expanded and then every permission is resolved with a
+    single query, an ``AssertionError`` is raised for the first role with
+    bad permissions. Resolved permissions are returned as well, mapping
+    their primary keys to ``(app_label, codename)``.
+    """
+    perm_maps, resolved, errors = _resolve_role_permissions(
+        {role.name: role.get_bound_permissions() for role in roles}, using
+    )
+    if errors:
+        raise AssertionError(str(next(iter(errors.values()))))
+    snapshot, permissions = {}, {}
+    for name, perm_map in perm_maps.items():
+        keys = list(iter_permission_keys(perm_map))
+        snapshot[name] = frozenset(resolved[key].pk for key in keys)
+        permissions.update(
+            (resolved[key].pk, (key[0], resolved[key].codename)) for key in keys
+        )
+    return snapshot, permissions
+
+
+def _is_valid_snapshot(permissions, using) -> bool:
+    """Whether permissions of a snapshot still exist with the same pks.
+
+    Permissions created by test fixtures get new primary keys upon each test
+    class on backends which do not roll back sequences.
+    """
+    from django.contrib.auth.models import Permission
+
+    current = (
+        Permission.objects.using(using)
+        .filter(pk__in=permissions)
+        .values_list("pk", "content_type__app_label", "codename")
+    )
+    return {pk: (app_label, codename) for pk, app_label, codename in current} == (
+        permissions
+    )
+
+
+def _restore_snapshot(snapshot, using):
+    """Creates missing role groups and binds their permissions in bulk."""
+    from django.contrib.auth.models import Group
+
+    groups, missing = _get_groups(list(snapshot), using)
+    groups = {name: group.pk for name, group in groups.items()}
+
+    through = Group.permissions.through
+    rows = {
+        (groups[name], perm_pk)
+        for name, perm_pks in snapshot.items()
+        for perm_pk in perm_pks
+    }
+    existing = [groups[name] for name in snapshot if name not in missing]
+    if existing:
+        # skip permissions which are already bound to existing groups
+        rows -= set(
+            through.objects.using(using)
+            .filter(group_id__in=existing)
+            .values_list("group_id", "permission_id")
+        )
+    if rows:
+        through.objects.using(using).bulk_create(
+            through(group_id=group_pk, permission_id=perm_pk)
+            for group_pk, perm_pk in rows
+        )
 
 
 class RoleEnabledTestMixin:
+    """Sets up role groups and permissions before running tests.
+
+    Permissions of roles are resolved once per database and set of roles,
+    then each test class restores role groups and permissions with a few
+    bulk queries. Roles loaded by a class (i.e. through ``roles_from``) are
+    only registered until the class is torn down.
+    """
+
     force_role_reload = False
     clear_role_registry = False
 
+    @classmethod
+    def setUpClass(cls):
+        saved = (dict(registry), registry._loaded)
+        cls.addClassCleanup(cls._restore_role_registry, *saved)
+        super().setUpClass()
+
+    @staticmethod
+    def _restore_role_registry(roles, loaded):
+        registry.replace(roles)
+        registry._loaded = loaded
+
     @classmethod
     def setUpTestData(cls):
+        from django.contrib.auth.models import Group
+
         super().setUpTestData()
         rolenames = getattr(cls, "roles", None)
         if isinstance(rolenames, str):
@@ -23,13 +126,14 @@ class RoleEnabledTestMixin:
             # load standard roles
             load_roles(force=cls.force_role_reload, clear=cls.clear_role_registry)
 
-        # setup roles
-        for name, role in registry.items():
-            if not rolenames or name in rolenames:
-                # istantiate role class
-                role = role()
-                try:
-                    role.setup_permissions()
-                except BadRoleException as e:
-                    # if something wrong raise assertion
-                    raise AssertionError(str(e))
+        roles = [
+            role
+            for name, role in registry.items()
+            if not rolenames or name in rolenames
+        ]
+        using = router.db_for_write(Group)
+        key = (using, frozenset(roles), is_hierarchical())
+        snapshot = _snapshots.get(key)
+        if snapshot is None or not _is_valid_snapshot(snapshot[1], using):
+            snapshot = _snapshots[key] = _get_snapshot(roles, using)
+        _restore_snapshot(snapshot[0], using)
@@ -1,10 +1,27 @@
+import sys
 from collections import defaultdict
-from functools import reduce
+from collections.abc import Mapping
+from functools import lru_cache
+from time import perf_counter
+from types import MappingProxyType
+from typing import NamedTuple
+from weakref import WeakValueDictionary
 
 from django.core.exceptions import MultipleObjectsReturned
 
 from .exceptions import BadRoleException
 
+# codename granting every permission of an app or of a model
+WILDCARD = "*"
+
+
+class PermissionsDiff(NamedTuple):
+    """Permissions (as ``app_label.codename``) changed by a role setup."""
+
+    added: frozenset
+    removed: frozenset
+    unchanged: frozenset
+
 
 def _map_permissions(perm_map: dict, permissions) -> dict:
     if not permissions:
@@ -16,6 +33,9 @@ def _map_permissions(perm_map: dict, permissions) -> dict:
     if isinstance(permissions, dict):
         # keys are app_label or app_label.model
         for label, perms in permissions.items():
+            if perms == WILDCARD:
+                # every permission of the app (or of the model)
+                perms = {"_codenames": [WILDCARD]} if "." not in label else [perms]
             try:
                 app_label, modelname = label.split(".", 1)
             except ValueError:
@@ -26,6 +46,8 @@ def _map_permissions(perm_map: dict, permissions) -> dict:
                         "bases by providing a dict"
                     )
                 for modelname, model_perms in perms.items():
+                    if model_perms == WILDCARD:
+                        model_perms = [model_perms]
                     perm_map[app_label][modelname] |= set(model_perms)
             else:
                 perm_map[app_label][modelname] |= set(perms)
@@ -44,22 +66,435 @@ def _map_permissions(perm_map: dict, permissions) -> dict:
     return perm_map
 
 
-def map_permissions(*permissions_list):
+class PermissionMap(Mapping):
+    """Immutable map of permission codenames by app label and model.
+
+    Maps are interned, thus equal maps are usually the same instance and can
+    be shared among roles. App labels and models are sorted, codenames are
+    stored as frozensets. Wildcards grant every permission of an app (when
+    bound to ``_codenames``) or of a model, making other codenames redundant.
+    """
+
+    __slots__ = ("_key", "_hash", "_apps", "_names", "_wildcards", "__weakref__")
+    _interned = WeakValueDictionary()
+
+    def __new__(cls, perm_map=None):
+        if isinstance(perm_map, PermissionMap):
+            return perm_map
+        key = tuple(
+            sorted(
+                (
+                    sys.intern(app_label),
+                    tuple(
+                        sorted(
+                            (
+                                sys.intern(modelname),
+                                (
+                                    frozenset([WILDCARD])
+                                    if WILDCARD in perms
+                                    else frozenset(sys.intern(perm) for perm in perms)
+                                ),
+                            )
+                            for modelname, perms in app_perms.items()
+                            if perms
+                        )
+                    ),
+                )
+                for app_label, app_perms in (perm_map or {}).items()
+                if any(app_perms.values())
+            )
+        )
+        self = cls._interned.get(key)
+        if self is None:
+            self = super().__new__(cls)
+            self._key = key
+            self._hash = hash(key)
+            self._apps = MappingProxyType(
+                {app_label: MappingProxyType(dict(models)) for app_label, models in key}
+            )
+            self._names = self._wildcards = None
+            self = cls._interned.setdefault(key, self)
+        return self
+
+    def __getitem__(self, app_label):
+        return self._apps[app_label]
+
+    def __iter__(self):
+        return iter(self._apps)
+
+    def __len__(self):
+        return len(self._apps)
+
+    def __eq__(self, other):
+        if isinstance(other, PermissionMap):
+            return self._key == other._key
+        return super().__eq__(other)
+
+    def __hash__(self):
+        return self._hash
+
+    def _as_dict(self) -> dict:
+        return {app_label: dict(models) for app_label, models in self._key}
+
+    def __reduce__(self):
+        return self.__class__, (self._as_dict(),)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self._as_dict()!r})"
+
+    @property
+    def names(self) -> frozenset:
+        """Permissions of the map, as ``app_label.codename``.
+
+        Wildcards are not included, see ``wildcards``.
+        """
+        if self._names is None:
+            self._names = frozenset(
+                f"{app_label}.{codename}"
+                for app_label, models in self._key
+                for _, perms in models
+                for codename in perms
+                if codename != WILDCARD
+            )
+        return self._names
+
+    @property
+    def wildcards(self) -> MappingProxyType:
+        """Models granted by wildcards, by app label.
+
+        Wildcards granting every permission of an app are mapped to the
+        ``_codenames`` model.
+        """
+        if self._wildcards is None:
+            wildcards = {}
+            for app_label, models in self._key:
+                models = frozenset(
+                    modelname for modelname, perms in models if WILDCARD in perms
+                )
+                if models:
+                    wildcards[app_label] = models
+            self._wildcards = MappingProxyType(wildcards)
+        return self._wildcards
+
+
+@lru_cache(maxsize=4096)
+def merge_permission_maps(*perm_maps) -> PermissionMap:
+    """Merges permission maps, memoizing results by the tuple of maps."""
+    perm_maps = [perm_map for perm_map in perm_maps if perm_map]
+    if len(perm_maps) == 1:
+        return perm_maps[0]
+    merged = defaultdict(lambda: defaultdict(set))
+    for perm_map in perm_maps:
+        for app_label, app_perms in perm_map.items():
+            for modelname, perms in app_perms.items():
+                merged[app_label][modelname] |= perms
+    return PermissionMap(merged)
+
+
+def normalize_permissions(permissions) -> PermissionMap:
+    """Turns permissions declared by a role into a permission map."""
+    if isinstance(permissions, PermissionMap):
+        return permissions
     perm_map = defaultdict(lambda: defaultdict(set))
-    # turn back defaultdicto into dict to avoid false matches
-    return dict(reduce(_map_permissions, permissions_list, perm_map))
+    return PermissionMap(_map_permissions(perm_map, permissions))
 
 
-def get_permission(codename: str, app_label: str, model: str):
-    from django.contrib.auth.models import Permission
+def map_permissions(*permissions_list) -> PermissionMap:
+    return merge_permission_maps(*map(normalize_permissions, permissions_list))
+
+
+def exclude_permissions(perm_map, *excluded) -> PermissionMap:
+    """Returns the permission map without permissions of the excluded maps.
+
+    Wildcards are only excluded by the same wildcards.
+    """
+    excluded = merge_permission_maps(*excluded)
+    if not excluded:
+        return PermissionMap(perm_map)
+    names, wildcards = excluded.names, excluded.wildcards
+    return PermissionMap(
+        {
+            app_label: {
+                modelname: {
+                    perm
+                    for perm in perms
+                    if f"{app_label}.{perm}" not in names
+                    and (
+                        perm != WILDCARD
+                        or modelname not in wildcards.get(app_label, ())
+                    )
+                }
+                for modelname, perms in app_perms.items()
+            }
+            for app_label, app_perms in perm_map.items()
+        }
+    )
+
+
+@lru_cache(maxsize=None)
+def get_wildcard_permissions(app_label: str, modelname: str) -> frozenset:
+    """Returns permissions granted by a wildcard, as ``app_label.codename``.
+
+    Permissions are the ones declared by options of installed models (either
+    of the model or, for ``_codenames``, of every model of the app), thus no
+    database access is required.
+    """
+    from django.apps import apps
+    from django.contrib.auth import get_permission_codename
 
     try:
+        if modelname == "_codenames":
+            models = apps.get_app_config(app_label).get_models()
+        else:
+            models = [apps.get_model(app_label, modelname)]
+    except LookupError:
+        return frozenset()
+    return frozenset(
+        f"{app_label}.{codename}"
+        for model in models
+        for codename in [
+            *(
+                get_permission_codename(action, model._meta)
+                for action in model._meta.default_permissions
+            ),
+            *(codename for codename, _ in model._meta.permissions),
+        ]
+    )
+
+
+def matches_wildcards(perm: str, wildcards: Mapping) -> bool:
+    """Whether a permission is granted by wildcards of a permission map.
+
+    App wildcards grant the permissions declared by every model of the app,
+    while model wildcards grant the permissions declared by the model.
+    """
+    app_label, _, codename = perm.partition(".")
+    models = wildcards.get(app_label)
+    if not models:
+        return False
+    return any(
+        perm in get_wildcard_permissions(app_label, modelname) for modelname in models
+    )
+
+
+def iter_permission_keys(perm_map: dict):
+    """Yields ``(app_label, model, codename)`` keys of a permission map."""
+    for app_label, app_perms in perm_map.items():
+        for modelname, perms in app_perms.items():
+            for perm in sorted(perms):
+                yield app_label, modelname, perm
+
+
+def _bad_permissions(keys) -> BadRoleException:
+    keys = list(keys)
+    labels = ", ".join(f"{codename} ({app_label})" for app_label, _, codename in keys)
+    permissions = [f"{app_label}.{codename}" for app_label, _, codename in keys]
+    return BadRoleException(
+        f"Permission{'s' if len(keys) > 1 else ''} {labels} cannot be bound to role",
+        permissions[0],
+        permissions,
+    )
+
+
+def _get_permissions_queryset(keys, using=None):
+    from django.contrib.auth.models import Permission
+
+    app_labels = {app_label for app_label, _, _ in keys}
+    codenames = {codename for _, _, codename in keys}
+    return (
+        Permission.objects.using(using)
+        .select_related("content_type")
+        .filter(content_type__app_label__in=app_labels, codename__in=codenames)
+        .order_by()
+    )
+
+
+def _match_permissions(keys, perms) -> tuple[dict, list]:
+    by_model = {}
+    by_app = defaultdict(list)
+    for perm in perms:
+        app_label = perm.content_type.app_label
+        by_model[app_label, perm.content_type.model, perm.codename] = perm
+        by_app[app_label, perm.codename].append(perm)
+
+    resolved, errors = {}, []
+    for key in keys:
+        app_label, model, codename = key
         if model == "_codenames":
-            return Permission.objects.get(
-                codename=codename, content_type__app_label=app_label
-            )
+            candidates = by_app.get((app_label, codename), ())
+            perm = candidates[0] if len(candidates) == 1 else None
+        else:
+            perm = by_model.get(key)
+        if perm is None:
+            errors.append(key)
         else:
-            return Permission.objects.get_by_natural_key(codename, app_label, model)
+            resolved[key] = perm
+    return resolved, errors
+
+
+def _resolve_permissions(keys, using=None) -> tuple[dict, list]:
+    """Resolves permission keys with a single query.
+
+    Returns a tuple with the mapping of resolved keys to their permissions
+    and the list of keys which are either missing or ambiguous.
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}, []
+    return _match_permissions(keys, _get_permissions_queryset(keys, using))
+
+
+async def _aresolve_permissions(keys, using=None) -> tuple[dict, list]:
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}, []
+    perms = [perm async for perm in _get_permissions_queryset(keys, using)]
+    return _match_permissions(keys, perms)
+
+
+def _get_wildcard_queryset(app_labels, using=None):
+    from django.contrib.auth.models import Permission
+
+    return (
+        Permission.objects.using(using)
+        .filter(content_type__app_label__in=app_labels)
+        .order_by()
+        .values_list("content_type__app_label", "content_type__model", "codename")
+    )
+
+
+def _expand_wildcards(perm_maps, rows) -> dict:
+    by_app = defaultdict(list)
+    for app_label, modelname, codename in rows:
+        by_app[app_label].append((modelname, codename))
+
+    expanded = {}
+    for perm_map in perm_maps:
+        if not perm_map.wildcards:
+            expanded[perm_map] = perm_map
+            continue
+        grants = {
+            app_label: {
+                modelname: set(perms - {WILDCARD})
+                for modelname, perms in app_perms.items()
+            }
+            for app_label, app_perms in perm_map.items()
+        }
+        for app_label, models in perm_map.wildcards.items():
+            for wildcard in models:
+                matched = [
+                    (modelname, codename)
+                    for modelname, codename in by_app[app_label]
+                    if wildcard in ("_codenames", modelname)
+                ]
+                if not matched:
+                    # wildcards matching no permission are left to be reported
+                    grants[app_label][wildcard].add(WILDCARD)
+                for modelname, codename in matched:
+                    grants[app_label].setdefault(modelname, set()).add(codename)
+        expanded[perm_map] = PermissionMap(grants)
+    return expanded
+
+
+def expand_wildcards(perm_maps, using=None) -> dict:
+    """Replaces wildcards of permission maps with the matching permissions.
+
+    Permissions of every app with wildcards are loaded with a single query,
+    nothing is queried if no map has wildcards. Returns expanded maps by the
+    original ones, wildcards matching no permission are left in place.
+    """
+    perm_maps = set(map(PermissionMap, perm_maps))
+    app_labels = {
+        app_label for perm_map in perm_maps for app_label in perm_map.wildcards
+    }
+    if not app_labels:
+        return {perm_map: perm_map for perm_map in perm_maps}
+    return _expand_wildcards(perm_maps, _get_wildcard_queryset(app_labels, using))
+
+
+async def aexpand_wildcards(perm_maps, using=None) -> dict:
+    """Async version of ``expand_wildcards``."""
+    perm_maps = set(map(PermissionMap, perm_maps))
+    app_labels = {
+        app_label for perm_map in perm_maps for app_label in perm_map.wildcards
+    }
+    if not app_labels:
+        return {perm_map: perm_map for perm_map in perm_maps}
+    rows = [row async for row in _get_wildcard_queryset(app_labels, using)]
+    return _expand_wildcards(perm_maps, rows)
+
+
+def _resolve_role_permissions(perm_maps: dict, using=None) -> tuple[dict, dict, dict]:
+    """Resolves permissions of many roles with (at most) two queries.
+
+    ``perm_maps`` maps role names to their permission maps, whose wildcards
+    are expanded first. Returns expanded maps by role name, resolved keys and
+    the errors of roles with bad permissions, by role name.
+    """
+    expanded = expand_wildcards(perm_maps.values(), using)
+    perm_maps = {name: expanded[perm_map] for name, perm_map in perm_maps.items()}
+    resolved, bad_keys = _resolve_permissions(
+        (
+            key
+            for perm_map in perm_maps.values()
+            for key in iter_permission_keys(perm_map)
+        ),
+        using,
+    )
+    bad_keys = set(bad_keys)
+    errors = {}
+    for name, perm_map in perm_maps.items():
+        role_bad_keys = [
+            key for key in iter_permission_keys(perm_map) if key in bad_keys
+        ]
+        if role_bad_keys:
+            errors[name] = _bad_permissions(role_bad_keys)
+    return perm_maps, resolved, errors
+
+
+def get_permissions(*perm_maps, using=None) -> dict:
+    """Resolves every permission of the provided permission maps at once.
+
+    Returns a dict which maps ``(app_label, model, codename)`` keys to the
+    matching permission. A ``BadRoleException`` naming every missing or
+    ambiguous permission is raised if any of them cannot be resolved.
+    Wildcards are expanded (with one more query) to the matching permissions.
+    Permissions are read from the ``using`` database, if provided, otherwise
+    from the one chosen by database routers.
+    """
+    from .instrumentation import timed
+
+    with timed("permissions.resolve", using=using, model="auth.Permission"):
+        expanded = expand_wildcards(perm_maps, using).values()
+        keys = (key for perm_map in expanded for key in iter_permission_keys(perm_map))
+        resolved, errors = _resolve_permissions(keys, using)
+    if errors:
+        raise _bad_permissions(errors)
+    return resolved
+
+
+async def aget_permissions(*perm_maps, using=None) -> dict:
+    """Async version of ``get_permissions``."""
+    expanded = (await aexpand_wildcards(perm_maps, using)).values()
+    keys = (key for perm_map in expanded for key in iter_permission_keys(perm_map))
+    resolved, errors = await _aresolve_permissions(keys, using)
+    if errors:
+        raise _bad_permissions(errors)
+    return resolved
+
+
+def get_permission(codename: str, app_label: str, model: str, using=None):
+    from django.contrib.auth.models import Permission
+
+    from .instrumentation import timed
+
+    manager = Permission.objects.db_manager(using)
+    try:
+        with timed("permissions.resolve", using=using, model="auth.Permission"):
+            if model == "_codenames":
+                return manager.get(codename=codename, content_type__app_label=app_label)
+            else:
+                return manager.get_by_natural_key(codename, app_label, model)
     except (
         ValueError,
         Permission.DoesNotExist,
@@ -69,3 +504,66 @@ def get_permission(codename: str, app_label: str, model: str):
             f"Permission {codename} ({app_label}) cannot be bound to role",
             f"{app_label}.{codename}",
         ) from ex
+
+
+def iter_batches(iterable, size):
+    """Yields lists of at most ``size`` items of the iterable."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def get_permission_name(perm) -> str:
+    return f"{perm.content_type.app_label}.{perm.codename}"
+
+
+def diff_permissions(declared: dict, current: dict, clear=False) -> tuple:
+    """Compares declared permissions with the currently bound ones.
+
+    Both arguments map permission pks to their names. Returns the resulting
+    ``PermissionsDiff`` together with the sets of pks to add and to remove.
+    """
+    added = declared.keys() - current.keys()
+    removed = current.keys() - declared.keys() if clear else set()
+    diff = PermissionsDiff(
+        added=frozenset(declared[pk] for pk in added),
+        removed=frozenset(current[pk] for pk in removed),
+        unchanged=frozenset(current[pk] for pk in current.keys() - removed),
+    )
+    return diff, added, removed
+
+
+class Measure:
+    """Measures elapsed time and queries executed within a block.
+
+    Example:
+        with Measure() as measure:
+            ...
+        print(measure.elapsed, measure.queries)
+    """
+
+    def __init__(self, using=None):
+        from django.db import DEFAULT_DB_ALIAS, connections
+
+        self.connection = connections[using or DEFAULT_DB_ALIAS]
+        self.elapsed = 0.0
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed += perf_counter() - self._start
+        return self._wrapper.__exit__(*exc_info)
@@ -0,0 +1,246 @@
+"""Benchmarks of role checks, permission resolution and roles setup.
+
+Synthetic roles and users are generated on an in-memory SQLite database
+created from ``tests/example_project`` settings, then wall time and query
+counts of each benchmark are printed as JSON (or written to ``--output``),
+so that results of different commits can be compared::
+
+    python tests/benchmarks/run.py --output before.json
+    python tests/benchmarks/run.py --compare before.json
+
+Sizes default to small values, to run quickly on a laptop, and can be raised
+up to thousands of roles and millions of users with ``--roles`` and
+``--users``.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+from io import StringIO
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path[:0] = [str(ROOT), str(ROOT / "tests")]
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.example_project.settings")
+
+
+def setup_database():
+    import django
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def build_roles(count, rng):
+    """Replaces registered roles with ``count`` synthetic ones.
+
+    Roles grant from 1 to 10 permissions and one out of five extends a
+    previously built role.
+    """
+    from django.contrib.auth.models import Permission
+    from django_group_role.roles import Role, registry
+
+    perms = [
+        f"{app_label}.{codename}"
+        for app_label, codename in Permission.objects.values_list(
+            "content_type__app_label", "codename"
+        )
+    ]
+    roles = {}
+    for i in range(count):
+        bases = (rng.choice(list(roles.values())),) if roles and i % 5 == 0 else ()
+        role = type(Role)(
+            f"SyntheticRole{i}",
+            bases or (Role,),
+            {
+                "__module__": __name__,
+                "name": f"Role {i}",
+                "permissions": rng.sample(perms, rng.randint(1, 10)),
+            },
+            register=False,
+        )
+        roles[role.name] = role
+    registry.replace(roles)
+    registry._loaded = True
+    return roles
+
+
+def build_users(count, roles, rng, batch_size=10000):
+    """Creates ``count`` users, each belonging to 1 to 3 roles."""
+    from django.contrib.auth import get_user_model
+    from django_group_role.membership import get_user_groups_through
+    from django_group_role.roles import get_role_group_ids
+
+    User = get_user_model()
+    through, user_field, group_field = get_user_groups_through()
+    group_ids = list(get_role_group_ids(roles).values())
+    for start in range(0, count, batch_size):
+        users = User.objects.bulk_create(
+            User(username=f"user{i}")
+            for i in range(start, min(count, start + batch_size))
+        )
+        through.objects.bulk_create(
+            through(**{f"{user_field}_id": user.pk, f"{group_field}_id": group_id})
+            for user in users
+            for group_id in rng.sample(group_ids, rng.randint(1, 3))
+        )
+
+
+def measure(results, name, ops, func):
+    from django_group_role.utils import Measure
+
+    with Measure() as measure:
+        func()
+    results[name] = {
+        "ops": ops,
+        "elapsed": measure.elapsed,
+        "queries": measure.queries,
+        "per_op_us": measure.elapsed / ops * 1e6 if ops else 0.0,
+    }
+
+
+def bench_populate_roles(results, roles):
+    from django.core.management import call_command
+
+    def populate():
+        call_command("populate_roles", stdout=StringIO())
+
+    # the first run creates every group and binds every permission
+    measure(results, "populate_roles", len(roles), populate)
+    measure(results, "populate_roles_noop", len(roles), populate)
+
+
+def bench_setup_permissions(results, roles, rng, sample):
+    from django.contrib.auth.models import Group
+
+    roles = [role() for role in rng.sample(list(roles.values()), sample)]
+    # unbind permissions, to be bound again
+    through = Group.permissions.through
+    through.objects.filter(group__name__in=[role.name for role in roles]).delete()
+
+    def setup():
+        for role in roles:
+            role.setup_permissions(clear=True)
+
+    measure(results, "setup_permissions", len(roles), setup)
+    measure(results, "setup_permissions_noop", len(roles), setup)
+
+
+def bench_is_user_in_role(results, roles, rng, sample):
+    from django.contrib.auth import get_user_model
+    from django_group_role import is_user_in_role
+
+    User = get_user_model()
+    pks = list(User.objects.values_list("pk", flat=True))
+    users = list(User.objects.filter(pk__in=rng.sample(pks, min(sample, len(pks)))))
+    names = [rng.choice(list(roles)) for _ in users]
+
+    def check():
+        for user, name in zip(users, names):
+            is_user_in_role(user, name)
+
+    # the first check of each user loads its groups, following ones do not
+    measure(results, "is_user_in_role", len(users), check)
+    measure(results, "is_user_in_role_cached", len(users), check)
+
+
+def bench_has_perm(results, roles, repeat=10):
+    checks = [
+        (role(), perm)
+        for role in roles.values()
+        for perm in sorted(role._perm_index)[:2] + ["missing.perm"]
+    ]
+
+    def check():
+        for _ in range(repeat):
+            for role, perm in checks:
+                role.has_perm(perm)
+
+    measure(results, "has_perm", len(checks) * repeat, check)
+
+
+def get_meta(args) -> dict:
+    import django
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "roles": args.roles,
+        "users": args.users,
+        "seed": args.seed,
+    }
+
+
+def compare(baseline: dict, results: dict):
+    """Prints per operation time and queries against a baseline run."""
+    print(
+        f"{'benchmark':<24}{'before us/op':>14}{'after us/op':>14}{'ratio':>8}"
+        f"{'queries':>16}",
+        file=sys.stderr,
+    )
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        ratio = result["per_op_us"] / before["per_op_us"] if before["per_op_us"] else 0
+        print(
+            f"{name:<24}{before['per_op_us']:>14.2f}{result['per_op_us']:>14.2f}"
+            f"{ratio:>8.2f}{before['queries']:>8} -> {result['queries']:<5}",
+            file=sys.stderr,
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--roles", type=int, default=100, help="Number of roles")
+    parser.add_argument("--users", type=int, default=10000, help="Number of users")
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=1000,
+        help="Number of users (and roles) checked or set up",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--output", help="JSON output file, defaults to stdout")
+    parser.add_argument("--compare", help="JSON output of a previous run")
+    args = parser.parse_args(argv)
+
+    setup_database()
+    rng = random.Random(args.seed)
+    results = {}
+    roles = build_roles(args.roles, rng)
+    bench_populate_roles(results, roles)
+    bench_setup_permissions(results, roles, rng, min(args.sample, args.roles))
+    build_users(args.users, roles, rng)
+    bench_is_user_in_role(results, roles, rng, args.sample)
+    bench_has_perm(results, roles)
+
+    output = json.dumps({"meta": get_meta(args), "results": results}, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text()), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+from django_group_role import Role
+
+from .roles import BasicRole  # noqa: F401
+
+
+class Auditors(Role):
+    name = "Auditors"
+    permissions = ["auth.view_permission"]
@@ -0,0 +1,21 @@
+class ReplicaRouter:
+    """Reads from the replica database and writes to the default one."""
+
+    def db_for_read(self, model, **hints):
+        return "replica"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class WriteReplicaRouter:
+    """Reads from and writes to the replica database."""
+
+    def db_for_read(self, model, **hints):
+        return "replica"
+
+    def db_for_write(self, model, **hints):
+        return "replica"
@@ -79,7 +79,12 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": str(BASE_DIR / "db.sqlite3"),
-    }
+    },
+    # stands for either a replica or a tenant database in tests
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": str(BASE_DIR / "replica.sqlite3"),
+    },
 }
 
 
@@ -0,0 +1,78 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django_group_role import aget_user_roles, ais_user_in_role
+from django_group_role.exceptions import BadRoleException
+from django_group_role.membership import _VERSION_KEY
+from django_group_role.roles import _group_ids
+from example_project.roles import BasicRole, Erasers, UserManagers
+
+
+class AsyncTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="user")
+        cls.user.groups.add(Group.objects.create(name="Users"))
+
+    async def get_user(self):
+        return await get_user_model().objects.aget(pk=self.user.pk)
+
+    async def test_group_ids_cached_upon_commit(self):
+        await UserManagers().aadd(await self.get_user())
+        # the test transaction is never committed
+        self.assertNotIn("User-Managers", _group_ids._ids.get("default", {}))
+
+    async def test_role_checks(self):
+        user = await self.get_user()
+        self.assertTrue(await ais_user_in_role(user, "Users"))
+        self.assertFalse(await ais_user_in_role(user, "User-Managers"))
+        self.assertFalse(await ais_user_in_role(user, "Unknown"))
+        self.assertEqual(await aget_user_roles(user), {"Users"})
+        # membership is cached on the user instance
+        await Group.user_set.through.objects.filter(user=user).adelete()
+        self.assertTrue(await ais_user_in_role(user, "Users"))
+
+    async def test_role_wrappers(self):
+        user = await self.get_user()
+        role = UserManagers()
+        self.assertFalse(await ais_user_in_role(user, role))
+        await role.aadd(user)
+        self.assertTrue(await ais_user_in_role(user, role))
+        await role.aremove(user)
+        self.assertFalse(await ais_user_in_role(user, role))
+        await role.aset([user])
+        self.assertTrue(await ais_user_in_role(user, role))
+        await role.aclear()
+        # building the queryset may look up group ids
+        users = await sync_to_async(role.users)()
+        self.assertEqual(await users.acount(), 0)
+
+    async def test_setup_permissions(self):
+        role = BasicRole()
+        result = await role.asetup_permissions()
+        self.assertEqual(result.added, {"auth.view_user", "auth.view_group"})
+        self.assertEqual(len(await role.aget_current_permissions()), 2)
+        result = await role.asetup_permissions(clear=True)
+        self.assertEqual(result.added, set())
+        self.assertEqual(result.unchanged, {"auth.view_user", "auth.view_group"})
+        with self.assertRaisesMessage(
+            BadRoleException, "Permission broken (auth) cannot be bound to role"
+        ):
+            await Erasers().asetup_permissions()
+
+    @override_settings(ROLES_CACHE="default")
+    async def test_shared_cache(self):
+        await cache.aclear()
+        self.assertTrue(await ais_user_in_role(await self.get_user(), "Users"))
+        await Group.user_set.through.objects.filter(user=self.user).adelete()
+        # cached membership is shared
+        self.assertTrue(await ais_user_in_role(await self.get_user(), "Users"))
+        version = await cache.aget(_VERSION_KEY.format(self.user.pk))
+        await UserManagers().aadd(self.user)
+        # shared membership is invalidated once the transaction is committed,
+        # until then members are read from the database
+        self.assertEqual(await cache.aget(_VERSION_KEY.format(self.user.pk)), version)
+        self.assertFalse(await ais_user_in_role(await self.get_user(), "Users"))
+        self.assertTrue(await ais_user_in_role(await self.get_user(), "User-Managers"))
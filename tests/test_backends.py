@@ -0,0 +1,93 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser, Group
+from django.test import TestCase, override_settings
+from django_group_role import Role, load_roles, registry
+from django_group_role.utils import get_wildcard_permissions
+
+
+class Deleters(Role, register=False):
+    name = "Deleters"
+    permissions = {
+        "auth": {
+            "user": ["delete_user"],
+            "group": ["delete_group"],
+            "permission": ["delete_permission"],
+        }
+    }
+
+
+class AuthAdmins(Role, register=False):
+    name = "Auth Admins"
+    permissions = ["auth.*"]
+
+
+@override_settings(
+    AUTHENTICATION_BACKENDS=["django_group_role.backends.RoleBackend"],
+)
+class RoleBackendTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="user")
+        # permissions are not bound to groups at all
+        cls.user.groups.add(
+            Group.objects.create(name="User-Managers"),
+            Group.objects.create(name="Deleters"),
+        )
+        Group.objects.create(name="Auth Admins")
+
+    def setUp(self):
+        saved = (dict(load_roles()), registry._loaded)
+        self.addCleanup(self._restore_registry, *saved)
+        registry.replace({**registry, "Deleters": Deleters, "Auth Admins": AuthAdmins})
+        self.user = get_user_model().objects.get(pk=self.user.pk)
+
+    def test_has_perm_loads_roles(self):
+        registry.clear()
+        registry._loaded = False
+        self.assertTrue(self.user.has_perm("auth.add_user"))
+
+    @staticmethod
+    def _restore_registry(roles, loaded):
+        registry.replace(roles)
+        registry._loaded = loaded
+
+    def test_has_perm(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(self.user.has_perm("auth.add_user"))
+            self.assertTrue(self.user.has_perm("auth.delete_group"))
+            self.assertFalse(self.user.has_perm("auth.add_group"))
+            self.assertTrue(self.user.has_perms(["auth.view_user", "auth.view_group"]))
+            self.assertTrue(self.user.has_module_perms("auth"))
+            self.assertFalse(self.user.has_module_perms("other"))
+
+    def test_get_all_permissions(self):
+        self.assertEqual(
+            self.user.get_all_permissions(),
+            {
+                "auth.view_user",
+                "auth.view_group",
+                "auth.add_user",
+                "auth.change_user",
+                "auth.delete_user",
+                "auth.delete_group",
+                "auth.delete_permission",
+            },
+        )
+        self.assertEqual(self.user.get_all_permissions(obj=self.user), set())
+
+    def test_wildcards(self):
+        self.user.groups.set([Group.objects.get(name="Auth Admins")])
+        user = get_user_model().objects.get(pk=self.user.pk)
+        perms = user.get_all_permissions()
+        # listed permissions are the ones granted by checks
+        self.assertEqual(perms, get_wildcard_permissions("auth", "_codenames"))
+        self.assertTrue(user.has_perms(perms))
+        self.assertFalse(user.has_perm("auth.custom"))
+        self.assertTrue(user.has_module_perms("auth"))
+        self.assertFalse(user.has_module_perms("other"))
+
+    def test_inactive_and_anonymous_users(self):
+        self.user.is_active = False
+        self.assertFalse(self.user.has_perm("auth.add_user"))
+        self.assertEqual(self.user.get_all_permissions(), set())
+        self.assertFalse(AnonymousUser().has_perm("auth.add_user"))
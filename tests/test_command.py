@@ -1,12 +1,21 @@
+import json
+import threading
 from io import StringIO
+from unittest import mock
 from django import VERSION
 from django.contrib.auth.models import Group
-from django.core.management import call_command
-from django.test import TestCase
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase, override_settings
 from guardian.shortcuts import assign_perm
+from django_group_role.roles import _group_ids
+from django_group_role.sync import plan_roles, sync_roles
+from example_project.roles import BasicRole
+from example_project.routers import WriteReplicaRouter
 
 
 class CommandTestCase(TestCase):
+    databases = {"default", "replica"}
+
     if VERSION < (4, 2):
         def assertQuerySetEqual(self, *args, **kwargs):
             return super().assertQuerysetEqual(*args, **kwargs)
@@ -238,3 +247,132 @@ class CommandTestCase(TestCase):
             transform=lambda p: p.natural_key(),
             ordered=False,
         )
+
+    def test_plan(self):
+        out = StringIO()
+        call_command("populate_roles", "Users", "Top-Managers", plan=True, stdout=out)
+        plan = json.loads(out.getvalue())
+        self.assertEqual(plan["clear"], False)
+        self.assertEqual(
+            plan["roles"],
+            {
+                "Users": {
+                    "created": False,
+                    "added": ["auth.view_group"],
+                    "removed": [],
+                    "errors": [],
+                },
+                "Top-Managers": {
+                    "created": True,
+                    "added": [
+                        "auth.add_group",
+                        "auth.add_permission",
+                        "auth.delete_group",
+                        "auth.delete_permission",
+                        "auth.view_group",
+                        "auth.view_permission",
+                        "auth.view_user",
+                    ],
+                    "removed": [],
+                    "errors": [],
+                },
+            },
+        )
+        self.assertEqual(sum(plan["queries"].values()), 3)
+        self.assertEqual(Group.objects.all().count(), 3)
+
+    def test_databases(self):
+        out = StringIO()
+        call_command(
+            "populate_roles", "Users", database=["default"], workers=2, stdout=out
+        )
+        self.assertEqual(
+            out.getvalue().split("\n"),
+            [
+                'Setting permissions for role "Users"...',
+                'Role "Users" setup completed!',
+                "",
+            ],
+        )
+        out = StringIO()
+        call_command("populate_roles", "Users", all_databases=True, stdout=out)
+        self.assertEqual(
+            out.getvalue().split("\n"),
+            [
+                'Database "default":',
+                'Setting permissions for role "Users"...',
+                'Role "Users" setup completed!',
+                'Database "replica":',
+                'Setting permissions for role "Users"...',
+                'Role "Users" setup completed!',
+                "",
+            ],
+        )
+        group = Group.objects.using("replica").get(name="Users")
+        self.assertEqual(group.permissions.count(), 2)
+        with self.assertRaisesMessage(CommandError, 'Database "missing"'):
+            call_command("populate_roles", database=["missing"], stdout=out)
+        with self.assertRaisesMessage(CommandError, "Workers must be"):
+            call_command("populate_roles", workers=0, stdout=out)
+
+    @override_settings(DATABASE_ROUTERS=[WriteReplicaRouter()])
+    def test_routed_database(self):
+        report = plan_roles([BasicRole])
+        self.assertTrue(report.roles["Users"].created)
+        out = StringIO()
+        call_command("populate_roles", "Users", stdout=out)
+        self.assertNotIn('Database "', out.getvalue())
+        group = Group.objects.using("replica").get(name="Users")
+        self.assertEqual(group.permissions.count(), 2)
+        self.assertEqual(sync_roles([BasicRole]).roles["Users"].diff.added, set())
+        # the default database is left untouched
+        self.assertEqual(
+            Group.objects.using("default").get(name="Users").permissions.count(), 2
+        )
+
+
+class WorkersTestCase(TransactionTestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        self.addCleanup(_group_ids.clear)
+
+    def test_workers(self):
+        threads = {}
+
+        def sync(*args, using, **kwargs):
+            threads[using] = threading.get_ident()
+            if using == "replica":
+                raise RuntimeError("replica unavailable")
+            return sync_roles(*args, using=using, **kwargs)
+
+        out = StringIO()
+        with mock.patch(
+            "django_group_role.management.commands.populate_roles.sync_roles", sync
+        ):
+            with self.assertRaisesMessage(
+                CommandError,
+                'Unable to setup roles on "replica" (replica unavailable)',
+            ):
+                call_command(
+                    "populate_roles",
+                    "Users",
+                    all_databases=True,
+                    workers=2,
+                    stdout=out,
+                )
+        # databases are handled by worker threads
+        self.assertCountEqual(threads, ["default", "replica"])
+        self.assertNotIn(threading.get_ident(), threads.values())
+        self.assertEqual(
+            out.getvalue().split("\n"),
+            [
+                'Database "default":',
+                'Setting permissions for role "Users"...',
+                'Role "Users" setup completed!',
+                "",
+            ],
+        )
+        group = Group.objects.get(name="Users")
+        self.assertEqual(group.permissions.count(), 2)
+        self.assertFalse(Group.objects.using("replica").exists())
@@ -1,4 +1,7 @@
+import importlib
+import threading
 from copy import deepcopy
+from django.apps import apps
 from django.core.exceptions import ImproperlyConfigured
 from django.test import SimpleTestCase, override_settings
 from django_group_role.roles import registry, load_roles
@@ -8,17 +11,20 @@ class ConfigurationTestCase(SimpleTestCase):
     # need to keep registry clear in these tests
     def setUp(self):
         self._registry = deepcopy(registry)
+        self._loaded = registry._loaded
         registry.clear()
 
     def tearDown(self):
         registry.clear()
         registry.update(self._registry)
+        registry._loaded = self._loaded
 
     @override_settings(ROLES_MODULE=None)
     def test_configuration_errors(self):
         with self.assertRaisesMessage(
             ImproperlyConfigured,
-            "ROLES_MODULE settings is required to correctly load roles!",
+            "ROLES_MODULE (or ROLES_FILE) settings is required to correctly "
+            "load roles!",
         ):
             load_roles(force=True)
 
@@ -41,3 +47,71 @@ class ConfigurationTestCase(SimpleTestCase):
                 "Groupers",
             ],
         )
+
+    @override_settings(ROLES_MODULE="example_project.roles_secondary")
+    def test_reloading_module(self):
+        from example_project import roles_secondary
+
+        load_roles(force=True)
+        previous = registry["Managers"]
+        # reloaded classes replace the registered ones
+        module = importlib.reload(roles_secondary)
+        self.assertIs(registry["Managers"], module.UserManagers)
+        self.assertIsNot(registry["Managers"], previous)
+        # as well as previously registered ones upon loading
+        registry.replace({**registry, "Managers": previous})
+        load_roles(force=True)
+        self.assertIs(registry["Managers"], module.UserManagers)
+        load_roles(force=True, clear=True)
+        self.assertCountEqual(registry.keys(), ["Base", "Managers", "Groupers"])
+        self.assertIs(registry["Groupers"], module.GroupManagers)
+        # other roles are still unable to take a registered name
+        with self.assertRaisesMessage(ValueError, "Base already bound"):
+            registry["Base"] = module.UserManagers
+
+    @override_settings(ROLES_MODULE="example_project.roles_imported")
+    def test_loading_imported_roles(self):
+        load_roles(force=True, clear=True)
+        self.assertCountEqual(registry.keys(), ["Auditors", "Users"])
+
+    @override_settings(
+        ROLES_MODULE="example_project.roles_secondary", ROLES_LOAD_ON_READY=True
+    )
+    def test_load_on_ready(self):
+        registry._loaded = False
+        apps.get_app_config("django_group_role").ready()
+        self.assertTrue(registry._loaded)
+        self.assertCountEqual(registry.keys(), ["Base", "Managers", "Groupers"])
+        self.assertEqual(registry.roles_with_perm("auth.add_group"), {"Groupers"})
+
+    @override_settings(ROLES_MODULE="example_project.roles_secondary")
+    def test_loading_is_lazy(self):
+        registry._loaded = False
+        self.assertIs(load_roles(), registry)
+        self.assertCountEqual(registry.keys(), ["Base", "Managers", "Groupers"])
+        # once loaded settings are not checked anymore
+        with override_settings(ROLES_MODULE=None):
+            self.assertIs(load_roles(), registry)
+
+    def test_reload_is_atomic(self):
+        load_roles(force=True)
+        expected = set(registry.keys())
+        stop = threading.Event()
+        seen = []
+
+        def read():
+            while not stop.is_set():
+                seen.append(set(registry.keys()))
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        try:
+            for _ in range(50):
+                load_roles(force=True, clear=True)
+        finally:
+            stop.set()
+            for reader in readers:
+                reader.join()
+        self.assertTrue(seen)
+        self.assertTrue(all(keys == expected for keys in seen))
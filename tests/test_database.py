@@ -1,8 +1,15 @@
+from unittest import mock
+
 from django import VERSION
-from django.contrib.auth.models import Group
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
 from django.test import TestCase
 from guardian.shortcuts import assign_perm
-from example_project.roles import BasicRole
+from django_group_role import BadRoleException
+from django_group_role.roles import _group_ids
+from django_group_role.utils import get_permissions, map_permissions
+from example_project.roles import BasicRole, GroupManagers, UserManagers
 
 
 class DatabaseSetupTestCase(TestCase):
@@ -53,3 +60,113 @@ class DatabaseSetupTestCase(TestCase):
             transform=str,
             ordered=False,
         )
+
+    def test_group_permissions_diff(self):
+        role = BasicRole()
+        assign_perm("auth.delete_user", role.group)
+        assign_perm("auth.view_user", role.group)
+        result = role.setup_permissions()
+        self.assertEqual(result.added, {"auth.view_group"})
+        self.assertEqual(result.removed, set())
+        self.assertEqual(result.unchanged, {"auth.view_user", "auth.delete_user"})
+        result = role.setup_permissions(clear=True)
+        self.assertEqual(result.added, set())
+        self.assertEqual(result.removed, {"auth.delete_user"})
+        self.assertEqual(result.unchanged, {"auth.view_user", "auth.view_group"})
+
+    def test_group_permissions_concurrent_writes(self):
+        role = BasicRole()
+        assign_perm("auth.view_user", role.group)
+        # another process bound the permission after it was read
+        with mock.patch.object(BasicRole, "get_current_permissions", return_value={}):
+            result = role.setup_permissions()
+        self.assertEqual(result.added, {"auth.view_user", "auth.view_group"})
+        self.assertEqual(role.group.permissions.count(), 2)
+
+    def test_group_permissions_no_writes(self):
+        role = BasicRole()
+        role.setup_permissions()
+        # only declared and bound permissions are read
+        with self.assertNumQueries(2):
+            result = role.setup_permissions(clear=True)
+        self.assertEqual(result.added, set())
+        self.assertEqual(result.removed, set())
+
+
+class PermissionResolutionTestCase(TestCase):
+    def test_resolve_with_single_query(self):
+        perm_map = map_permissions(
+            ["auth.view_user", "auth.view_group"],
+            {"auth.permission": ["add_permission", "delete_permission"]},
+        )
+        with self.assertNumQueries(1):
+            perms = get_permissions(perm_map, GroupManagers._permissions)
+        self.assertEqual(
+            {p.natural_key() for p in perms.values()},
+            {
+                ("view_user", "auth", "user"),
+                ("view_group", "auth", "group"),
+                ("add_group", "auth", "group"),
+                ("delete_group", "auth", "group"),
+                ("add_permission", "auth", "permission"),
+                ("delete_permission", "auth", "permission"),
+            },
+        )
+
+    def test_resolve_reports_every_error(self):
+        ContentType.objects.create(app_label="auth", model="other")
+        Permission.objects.create(
+            codename="view_user",
+            name="Can view user",
+            content_type=ContentType.objects.get_by_natural_key("auth", "other"),
+        )
+        perm_map = map_permissions(
+            ["auth.view_user", "auth.view_group", "auth.missing"],
+            {"auth.group": ["broken"]},
+        )
+        with self.assertRaisesMessage(
+            BadRoleException,
+            "Permissions missing (auth), view_user (auth), broken (auth) "
+            "cannot be bound to role",
+        ) as ctx:
+            get_permissions(perm_map)
+        self.assertEqual(ctx.exception.permission, "auth.missing")
+        self.assertEqual(
+            ctx.exception.permissions,
+            ("auth.missing", "auth.view_user", "auth.broken"),
+        )
+
+
+class GroupIdCacheTestCase(TestCase):
+    def setUp(self):
+        self.addCleanup(_group_ids.clear)
+
+    def test_group_ids_cache(self):
+        Group.objects.create(name="Users")
+        with self.captureOnCommitCallbacks(execute=True):
+            # every registered role group is loaded, only the requested one
+            # is created
+            with self.assertNumQueries(3):
+                group = UserManagers().group
+        self.assertEqual(group, Group.objects.get(name="User-Managers"))
+        self.assertFalse(Group.objects.filter(name="Group Managers").exists())
+        user = get_user_model().objects.create(username="user")
+        users_group = Group.objects.get(name="Users")
+        with self.assertNumQueries(0):
+            self.assertEqual(BasicRole().group, users_group)
+            self.assertEqual(UserManagers().group, group)
+        with self.assertNumQueries(1):
+            UserManagers().remove(user)
+
+    def test_group_ids_cache_invalidation(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            group = BasicRole().group
+        group = Group.objects.get(pk=group.pk)
+        group.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertNotEqual(BasicRole().group.pk, group.pk)
+        group = Group.objects.get(name="Users")
+        group.name = "Renamed"
+        group.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertNotEqual(BasicRole().group.pk, group.pk)
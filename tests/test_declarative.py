@@ -0,0 +1,129 @@
+import json
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from django_group_role import declarative
+from django_group_role.declarative import load_role_file
+from django_group_role.roles import load_roles, registry
+
+ROLES_DIR = Path(__file__).parent / "example_project"
+
+
+class DeclarativeTestCase(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        settings = override_settings(ROLES_COMPILED_DIR=str(self.tmp / "compiled"))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(declarative._loaded_files.clear)
+
+    def write(self, data, name="roles.json"):
+        path = self.tmp / name
+        path.write_text(json.dumps(data))
+        return path
+
+    def test_load(self):
+        for name in ("roles.json", "roles.toml"):
+            with self.subTest(name):
+                if name.endswith(".toml") and sys.version_info < (3, 11):
+                    self.skipTest("tomllib requires python 3.11")
+                roles = load_role_file(ROLES_DIR / name)
+                self.assertCountEqual(
+                    roles, ["Auditors", "Account-Managers", "Chief-Auditors"]
+                )
+                self.assertEqual(
+                    roles["Auditors"]._perm_index,
+                    {"auth.view_user", "auth.view_group", "auth.view_permission"},
+                )
+                chief = roles["Chief-Auditors"]
+                self.assertTrue(issubclass(chief, roles["Auditors"]))
+                self.assertTrue(issubclass(chief, roles["Account-Managers"]))
+                self.assertEqual(
+                    chief._perm_index,
+                    {
+                        "auth.view_user",
+                        "auth.view_group",
+                        "auth.view_permission",
+                        "auth.add_user",
+                        "auth.change_user",
+                        "auth.delete_user",
+                    },
+                )
+                # roles are not registered
+                self.assertNotIn("Auditors", registry)
+
+    def test_compiled_file(self):
+        path = self.write({"Role": {"permissions": ["auth.view_user"]}})
+        roles = load_role_file(path)
+        # unchanged files return the same roles
+        self.assertIs(load_role_file(path)["Role"], roles["Role"])
+        self.assertEqual(len(list((self.tmp / "compiled").iterdir())), 1)
+
+        # following processes skip normalization
+        declarative._loaded_files.clear()
+        with mock.patch.object(declarative, "_compile") as compile:
+            role = load_role_file(path)["Role"]
+        compile.assert_not_called()
+        self.assertIsNot(role, roles["Role"])
+        self.assertEqual(role._perm_index, {"auth.view_user"})
+
+        # changed files are compiled again
+        path = self.write({"Role": {"permissions": ["auth.add_user"]}})
+        self.assertEqual(load_role_file(path)["Role"]._perm_index, {"auth.add_user"})
+        self.assertEqual(len(list((self.tmp / "compiled").iterdir())), 2)
+
+    def test_errors(self):
+        cases = {
+            "Role A is not valid": {"A": {"permissions": ["view_user"]}},
+            "Role A must specify at least 1 permission": {"A": {}},
+            "Role A has unknown keys: name": {"A": {"name": "B"}},
+            "Role A extends unknown role B": {"A": {"extends": "B"}},
+            "Role inheritance cycle: A -> B -> A": {
+                "A": {"extends": "B", "permissions": ["auth.view_user"]},
+                "B": {"extends": "A", "permissions": ["auth.view_user"]},
+            },
+        }
+        for message, data in cases.items():
+            with self.subTest(message):
+                with self.assertRaisesMessage(ImproperlyConfigured, message):
+                    load_role_file(self.write(data))
+        path = self.tmp / "roles.json"
+        path.write_text("{")
+        with self.assertRaisesMessage(ImproperlyConfigured, "Unable to parse"):
+            load_role_file(path)
+        with self.assertRaisesMessage(ImproperlyConfigured, "Unable to read"):
+            load_role_file(self.tmp / "missing.json")
+        with self.assertRaisesMessage(ImproperlyConfigured, "either a .json"):
+            load_role_file(self.write({}, name="roles.yaml"))
+
+    def test_load_roles(self):
+        self.addCleanup(registry.replace, dict(registry))
+        self.addCleanup(setattr, registry, "_loaded", registry._loaded)
+        path = self.write({"Auditors": {"permissions": ["auth.view_user"]}})
+        with override_settings(ROLES_MODULE=None, ROLES_FILE=str(path)):
+            load_roles(force=True, clear=True)
+            self.assertEqual(list(registry), ["Auditors"])
+            path = self.write({"Readers": {"permissions": ["auth.view_user"]}})
+            load_roles(force=True)
+            # roles of the previous file are replaced
+            self.assertEqual(list(registry), ["Readers"])
+        with override_settings(
+            ROLES_MODULE="example_project.roles_secondary", ROLES_FILE=str(path)
+        ):
+            load_roles(force=True, clear=True)
+            self.assertCountEqual(registry, ["Base", "Managers", "Groupers", "Readers"])
+        # file roles never replace module roles
+        path = self.write({"Managers": {"permissions": ["auth.view_user"]}})
+        with override_settings(
+            ROLES_MODULE="example_project.roles_secondary", ROLES_FILE=str(path)
+        ):
+            with self.assertRaisesMessage(
+                ValueError, "Managers already bound to role registry"
+            ):
+                load_roles(force=True, clear=True)
@@ -1,6 +1,13 @@
 from django.test import SimpleTestCase
 from django_group_role import Role, registry
-from example_project.roles import AbstractRole, Erasers, GroupManagers, UserManagers
+from django_group_role.roles import _RoleRegistry
+from example_project.roles import (
+    AbstractRole,
+    Erasers,
+    GroupManagers,
+    GroupPermManagers,
+    UserManagers,
+)
 
 
 class DefinitionsTestCase(SimpleTestCase):
@@ -79,3 +86,40 @@ class DefinitionsTestCase(SimpleTestCase):
                 role = rolecls()
                 self.assertTrue(role.has_perms(*owned_perms))
                 self.assertFalse(role.has_any_perm(*not_owned_perms))
+
+    def test_permission_index(self):
+        self.assertEqual(
+            GroupPermManagers._perm_index,
+            {
+                "auth.view_user",
+                "auth.view_group",
+                "auth.add_group",
+                "auth.delete_group",
+                "auth.add_permission",
+                "auth.view_permission",
+                "auth.delete_permission",
+            },
+        )
+        role = Erasers()
+        self.assertTrue(role.has_perm("auth.delete_group"))
+        self.assertFalse(role.has_perm("auth.view_group"))
+        self.assertFalse(role.has_perm("invalid"))
+
+    def test_roles_with_perm(self):
+        roles = _RoleRegistry(
+            {
+                role.name: role
+                for role in (UserManagers, GroupManagers, GroupPermManagers, Erasers)
+            }
+        )
+        self.assertEqual(
+            roles.roles_with_perm("auth.view_group"),
+            {"User-Managers", "Group Managers", "Top-Managers"},
+        )
+        self.assertEqual(
+            roles.roles_with_perm("auth.delete_group"),
+            {"Group Managers", "Top-Managers", "Erasers"},
+        )
+        self.assertEqual(roles.roles_with_perm("auth.other"), set())
+        roles.clear()
+        self.assertEqual(roles.roles_with_perm("auth.view_group"), set())
@@ -0,0 +1,130 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.test import TestCase, override_settings
+from django_group_role import (
+    get_roles_for_users,
+    get_user_roles,
+    is_user_in_role,
+    load_roles,
+    users_in_roles,
+)
+from django_group_role.roles import _group_ids
+from django_group_role.sync import sync_roles
+from example_project.roles import (
+    BasicRole,
+    GroupManagers,
+    GroupPermManagers,
+    UserManagers,
+)
+
+
+class RoleClosureTestCase(TestCase):
+    def test_closure(self):
+        registry = load_roles()
+        self.assertEqual(
+            registry.with_ancestors(["Top-Managers"]),
+            {"Top-Managers", "Group Managers", "Users"},
+        )
+        self.assertEqual(
+            registry.with_descendants(["Users"]),
+            {"Users", "User-Managers", "Group Managers", "Top-Managers"},
+        )
+        self.assertEqual(registry.with_descendants(["Other"]), {"Other"})
+
+    def test_own_permissions(self):
+        registry = load_roles()
+        self.assertEqual(
+            registry.get_own_permissions(GroupManagers).names,
+            {"auth.add_group", "auth.delete_group"},
+        )
+        self.assertEqual(
+            registry.get_own_permissions(GroupPermManagers).names,
+            {"auth.add_permission", "auth.view_permission", "auth.delete_permission"},
+        )
+        # every permission is bound unless roles are hierarchical
+        self.assertIs(GroupManagers.get_bound_permissions(), GroupManagers._permissions)
+        with self.settings(ROLES_HIERARCHICAL=True):
+            self.assertEqual(
+                GroupManagers.get_bound_permissions().names,
+                {"auth.add_group", "auth.delete_group"},
+            )
+
+
+@override_settings(
+    AUTHENTICATION_BACKENDS=["django_group_role.backends.RoleBackend"],
+    ROLES_HIERARCHICAL=True,
+)
+class HierarchicalRolesTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create(username="user")
+        cls.user.groups.add(Group.objects.create(name="Top-Managers"))
+        cls.other = User.objects.create(username="other")
+        cls.other.groups.add(Group.objects.create(name="User-Managers"))
+        Group.objects.create(name="Users")
+
+    def setUp(self):
+        self.addCleanup(_group_ids.clear)
+        self.user = get_user_model().objects.get(pk=self.user.pk)
+
+    def test_role_checks(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(is_user_in_role(self.user, "Top-Managers"))
+            self.assertTrue(is_user_in_role(self.user, "Group Managers"))
+            self.assertTrue(is_user_in_role(self.user, BasicRole()))
+            self.assertFalse(is_user_in_role(self.user, "User-Managers"))
+            self.assertEqual(
+                get_user_roles(self.user),
+                {"Top-Managers", "Group Managers", "Users"},
+            )
+        with self.settings(ROLES_HIERARCHICAL=False):
+            self.assertFalse(is_user_in_role(self.user, "Users"))
+
+    def test_backend(self):
+        self.assertTrue(self.user.has_perm("auth.view_user"))
+        self.assertTrue(self.user.has_perm("auth.add_permission"))
+        self.assertFalse(self.user.has_perm("auth.add_user"))
+
+    def test_users(self):
+        self.assertQuerySetEqual(
+            BasicRole.users().order_by("username"), ["other", "user"], str
+        )
+        self.assertQuerySetEqual(GroupManagers.users(), ["user"], str)
+        self.assertQuerySetEqual(
+            users_in_roles("Users", "Group Managers", mode="all"), ["user"], str
+        )
+        self.assertQuerySetEqual(
+            users_in_roles("User-Managers", "Group Managers", mode="all"), [], str
+        )
+
+    def test_roles_for_users(self):
+        self.assertEqual(
+            get_roles_for_users(
+                [self.user, self.other], roles=["Users", "Group Managers"]
+            ),
+            {
+                self.user.pk: {"Users", "Group Managers"},
+                self.other.pk: {"Users"},
+            },
+        )
+
+    def test_sync_binds_own_permissions(self):
+        roles = [BasicRole, UserManagers, GroupManagers, GroupPermManagers]
+        report = sync_roles(roles)
+        self.assertEqual(
+            report.roles["Group Managers"].diff.added,
+            {"auth.add_group", "auth.delete_group"},
+        )
+        through = Group.permissions.through
+        self.assertEqual(
+            through.objects.filter(group__name__in=[r.name for r in roles]).count(),
+            9,
+        )
+        # inherited permissions are bound once, by the role declaring them
+        group = Group.objects.get(name="Top-Managers")
+        self.assertEqual(
+            set(group.permissions.values_list("codename", flat=True)),
+            {"add_permission", "view_permission", "delete_permission"},
+        )
+        self.assertEqual(GroupPermManagers().setup_permissions().added, set())
@@ -0,0 +1,109 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.test import TestCase, override_settings
+from django_group_role import is_user_in_role
+from django_group_role.instrumentation import (
+    InMemoryCollector,
+    StatsdCollector,
+    get_collector,
+)
+from django_group_role.roles import _group_ids
+from django_group_role.sync import sync_roles
+from example_project.roles import BasicRole, UserManagers
+from example_project.routers import ReplicaRouter
+
+
+@override_settings(
+    ROLES_METRICS_COLLECTOR="django_group_role.instrumentation.InMemoryCollector"
+)
+class InstrumentationTestCase(TestCase):
+    databases = {"default", "replica"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="user")
+        cls.user.groups.add(Group.objects.create(name="Users"))
+
+    def setUp(self):
+        self.addCleanup(_group_ids.clear)
+        self.collector = get_collector()
+        self.assertIsInstance(self.collector, InMemoryCollector)
+        # the collector is shared by tests of the class
+        self.collector.reset()
+
+    def test_role_checks(self):
+        user = get_user_model().objects.get(pk=self.user.pk)
+        self.assertTrue(is_user_in_role(user, "Users"))
+        self.assertTrue(is_user_in_role(user, "Users"))
+        self.assertEqual(self.collector.counters["membership.instance_cache.miss"], 1)
+        self.assertEqual(self.collector.counters["membership.instance_cache.hit"], 1)
+        self.assertEqual(len(self.collector.timings["membership.is_user_in_role"]), 2)
+        self.assertEqual(
+            self.collector.counters["membership.is_user_in_role.queries"], 1
+        )
+
+    @override_settings(DATABASE_ROUTERS=[ReplicaRouter()])
+    def test_routed_queries(self):
+        user = get_user_model().objects.using("default").get(pk=self.user.pk)
+        # the replica is unaware of the user groups
+        self.assertFalse(is_user_in_role(user, "Users"))
+        self.assertEqual(
+            self.collector.counters["membership.is_user_in_role.queries"], 1
+        )
+
+    @override_settings(ROLES_CACHE="default")
+    def test_shared_cache(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        for _ in range(2):
+            user = get_user_model().objects.get(pk=self.user.pk)
+            is_user_in_role(user, "Users")
+        self.assertEqual(self.collector.counters["membership.shared_cache.miss"], 1)
+        self.assertEqual(self.collector.counters["membership.shared_cache.hit"], 1)
+
+    def test_role_operations(self):
+        role = UserManagers()
+        role.setup_permissions()
+        role.add(self.user)
+        self.assertEqual(self.collector.counters["group_ids.cache.miss"], 1)
+        self.assertEqual(len(self.collector.timings["role.setup_permissions"]), 1)
+        self.assertEqual(len(self.collector.timings["permissions.resolve"]), 1)
+        self.assertEqual(self.collector.counters["permissions.resolve.queries"], 1)
+        self.assertEqual(len(self.collector.timings["role.add"]), 1)
+        self.assertIn(
+            (
+                "timing",
+                "role.add",
+                self.collector.timings["role.add"][0],
+                {"role": role.name},
+            ),
+            self.collector.events,
+        )
+        role.bulk_remove([self.user])
+        self.assertEqual(self.collector.counters["role.bulk_remove.queries"], 1)
+
+    def test_sync(self):
+        sync_roles([BasicRole])
+        for phase in ("groups", "permissions", "current", "write"):
+            self.assertEqual(len(self.collector.timings[f"sync.{phase}"]), 1)
+        self.assertEqual(self.collector.counters["sync.permissions.queries"], 1)
+        self.assertEqual(self.collector.counters["sync.errors"], 0)
+
+    @override_settings(ROLES_METRICS_COLLECTOR=None)
+    def test_disabled(self):
+        self.assertIsNone(get_collector())
+        is_user_in_role(self.user, "Users")
+        self.assertEqual(self.collector.events, [])
+
+
+class AdaptersTestCase(TestCase):
+    def test_statsd(self):
+        client = mock.Mock()
+        collector = StatsdCollector(client, prefix="roles")
+        collector.increment("group_ids.cache.hit", 2, {"role": "Users"})
+        collector.timing("role.add", 0.5)
+        client.incr.assert_called_once_with("roles.group_ids.cache.hit", 2)
+        client.timing.assert_called_once_with("roles.role.add", 500)
@@ -0,0 +1,328 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser, Group
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed
+from django.test import TestCase, override_settings
+from django_group_role import (
+    get_roles_for_users,
+    get_user_roles,
+    invalidate_user_roles,
+    is_user_in_role,
+    prefetch_user_roles,
+    users_in_roles,
+)
+from django_group_role.roles import _group_ids
+from example_project.roles import BasicRole, UserManagers
+from example_project.routers import ReplicaRouter
+
+
+class MembershipTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="user")
+        cls.user.groups.add(
+            Group.objects.create(name="Users"), Group.objects.create(name="Other")
+        )
+
+    def setUp(self):
+        self.user = get_user_model().objects.get(pk=self.user.pk)
+
+    def test_role_checks_use_a_single_query(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(is_user_in_role(self.user, "Users"))
+            self.assertTrue(is_user_in_role(self.user, BasicRole()))
+            self.assertFalse(is_user_in_role(self.user, "User-Managers"))
+            self.assertFalse(is_user_in_role(self.user, "Other"))
+            self.assertEqual(get_user_roles(self.user), {"Users"})
+
+    def test_anonymous_user(self):
+        self.assertFalse(is_user_in_role(AnonymousUser(), "Users"))
+        self.assertEqual(get_user_roles(AnonymousUser()), set())
+
+    def test_role_wrappers_invalidate_cache(self):
+        role = UserManagers()
+        self.assertFalse(is_user_in_role(self.user, "User-Managers"))
+        role.add(self.user)
+        self.assertTrue(is_user_in_role(self.user, "User-Managers"))
+        role.remove(self.user)
+        self.assertFalse(is_user_in_role(self.user, "User-Managers"))
+        role.set([self.user])
+        self.assertTrue(is_user_in_role(self.user, "User-Managers"))
+
+    def test_explicit_invalidation(self):
+        self.assertTrue(is_user_in_role(self.user, "Users"))
+        # bypass m2m signals
+        self.user.groups.through.objects.filter(user=self.user).delete()
+        self.assertTrue(is_user_in_role(self.user, "Users"))
+        invalidate_user_roles(self.user)
+        self.assertFalse(is_user_in_role(self.user, "Users"))
+
+    def test_groups_changes_invalidate_cache(self):
+        self.assertTrue(is_user_in_role(self.user, "Users"))
+        self.user.groups.clear()
+        self.assertFalse(is_user_in_role(self.user, "Users"))
+
+
+@override_settings(ROLES_CACHE="default")
+class SharedMembershipTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="user")
+        # membership is shared once committed
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.user.groups.add(Group.objects.create(name="Users"))
+
+    def setUp(self):
+        cache.clear()
+
+    def check_role(self, role, expected, queries):
+        # always use a fresh instance to skip the per-instance cache
+        user = get_user_model().objects.get(pk=self.user.pk)
+        with self.assertNumQueries(queries):
+            self.assertIs(is_user_in_role(user, role), expected)
+
+    def test_membership_is_shared(self):
+        self.check_role("Users", True, 1)
+        self.check_role("Users", True, 0)
+        self.check_role("User-Managers", False, 0)
+
+    def test_role_wrappers_invalidate_cache(self):
+        self.check_role("User-Managers", False, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            UserManagers().add(self.user)
+            # not shared until committed
+            self.check_role("User-Managers", True, 1)
+        self.check_role("User-Managers", True, 1)
+        self.check_role("User-Managers", True, 0)
+
+    def test_groups_changes_invalidate_cache(self):
+        self.check_role("Users", True, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Group.objects.get(name="Users").user_set.clear()
+        self.check_role("Users", False, 1)
+        self.check_role("Users", False, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(Group.objects.get(name="Users"))
+        self.check_role("Users", True, 1)
+
+    def test_group_deletion_invalidates_cache(self):
+        self.check_role("Users", True, 1)
+        self.check_role("Users", True, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Group.objects.get(name="Users").delete()
+        self.check_role("Users", False, 1)
+
+    def test_group_rename_invalidates_cache(self):
+        self.check_role("Users", True, 1)
+        group = Group.objects.get(name="Users")
+        group.name = "Former Users"
+        with self.captureOnCommitCallbacks(execute=True):
+            group.save()
+        self.check_role("Users", False, 1)
+        # groups saved with the same name do not invalidate members
+        with self.captureOnCommitCallbacks(execute=True):
+            group.save()
+        self.check_role("Users", False, 0)
+
+
+class BatchMembershipTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        users = Group.objects.create(name="Users")
+        managers = Group.objects.create(name="User-Managers")
+        other = Group.objects.create(name="Other")
+        User = get_user_model()
+        cls.first = User.objects.create(username="first")
+        cls.first.groups.add(users, managers, other)
+        cls.second = User.objects.create(username="second")
+        cls.second.groups.add(managers)
+        cls.third = User.objects.create(username="third")
+
+    def test_get_roles_for_users(self):
+        with self.assertNumQueries(1):
+            roles = get_roles_for_users([self.first, self.second.pk, self.third])
+        self.assertEqual(
+            roles,
+            {
+                self.first.pk: {"Users", "User-Managers"},
+                self.second.pk: {"User-Managers"},
+                self.third.pk: set(),
+            },
+        )
+        with self.assertNumQueries(1):
+            roles = get_roles_for_users(
+                [self.first, self.second], roles=["Users", BasicRole]
+            )
+        self.assertEqual(roles, {self.first.pk: {"Users"}, self.second.pk: set()})
+
+    def test_prefetch_user_roles(self):
+        with self.assertNumQueries(2):
+            users = list(
+                prefetch_user_roles(
+                    get_user_model()
+                    .objects.filter(
+                        pk__in=[self.first.pk, self.second.pk, self.third.pk]
+                    )
+                    .order_by("username")
+                )
+            )
+            self.assertEqual(
+                [is_user_in_role(user, "User-Managers") for user in users],
+                [True, True, False],
+            )
+            self.assertEqual(
+                [get_user_roles(user) for user in users],
+                [{"Users", "User-Managers"}, {"User-Managers"}, set()],
+            )
+
+    def test_users_in_roles(self):
+        self.assertQuerySetEqual(
+            UserManagers.users(), [self.first, self.second], ordered=False
+        )
+        self.assertQuerySetEqual(BasicRole().users(), [self.first])
+        self.assertQuerySetEqual(
+            users_in_roles("Users", UserManagers),
+            [self.first, self.second],
+            ordered=False,
+        )
+        self.assertQuerySetEqual(
+            users_in_roles("Users", UserManagers, mode="all"), [self.first]
+        )
+        # roles without groups
+        self.assertQuerySetEqual(users_in_roles("Top-Managers"), [])
+        self.assertQuerySetEqual(
+            users_in_roles("Users", "Top-Managers", mode="all"), []
+        )
+        self.assertQuerySetEqual(users_in_roles("Users", "Top-Managers"), [self.first])
+        with self.assertRaisesMessage(
+            ValueError, 'Mode must be either "any" or "all" (but is none)'
+        ):
+            users_in_roles("Users", mode="none")
+
+    def test_users_in_roles_group_ids_cache(self):
+        self.addCleanup(_group_ids.clear)
+        with self.captureOnCommitCallbacks(execute=True):
+            list(users_in_roles("Users", "User-Managers", mode="all"))
+        with self.assertNumQueries(1):
+            list(users_in_roles("Users", "User-Managers", mode="all"))
+
+
+class RoutingTestCase(TestCase):
+    databases = {"default", "replica"}
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create(username="user")
+        # only the replica knows the user belongs to the role
+        replica_user = User.objects.db_manager("replica").create(
+            pk=cls.user.pk, username="user"
+        )
+        Group.objects.db_manager("replica").create(name="Users").user_set.add(
+            replica_user
+        )
+
+    def setUp(self):
+        self.addCleanup(_group_ids.clear)
+
+    def get_user(self):
+        return get_user_model().objects.get(pk=self.user.pk)
+
+    def test_explicit_database(self):
+        self.assertFalse(is_user_in_role(self.get_user(), "Users"))
+        user = self.get_user()
+        with self.assertNumQueries(0), self.assertNumQueries(2, using="replica"):
+            self.assertTrue(is_user_in_role(user, "Users", using="replica"))
+            self.assertEqual(
+                get_roles_for_users([user], using="replica"),
+                {user.pk: {"Users"}},
+            )
+        self.assertEqual(list(users_in_roles("Users", using="replica")), [user])
+        self.assertEqual(list(BasicRole.users(using="replica")), [user])
+        self.assertEqual(BasicRole.users().count(), 0)
+        self.assertEqual(BasicRole(using="replica").group._state.db, "replica")
+
+    def test_role_database(self):
+        role = BasicRole(using="replica")
+        self.assertEqual(role.users().db, "replica")
+        self.assertEqual(list(role.users()), [self.user])
+        self.assertEqual(role.users(using="default").count(), 0)
+        self.assertEqual(BasicRole().users().count(), 0)
+        self.assertTrue(is_user_in_role(self.get_user(), role))
+        self.assertFalse(is_user_in_role(self.get_user(), BasicRole()))
+        self.assertFalse(is_user_in_role(self.get_user(), role, using="default"))
+
+    @override_settings(DATABASE_ROUTERS=[ReplicaRouter()])
+    def test_routed_database(self):
+        user = self.get_user()
+        with self.assertNumQueries(0), self.assertNumQueries(1, using="replica"):
+            self.assertTrue(is_user_in_role(user, "Users"))
+        # groups are created and users added on the primary
+        role = UserManagers()
+        with self.assertNumQueries(0, using="replica"):
+            self.assertEqual(role.group._state.db, "default")
+            role.add(user)
+        self.assertEqual(list(role.users(using="default")), [user])
+        self.assertEqual(users_in_roles(role).db, "replica")
+
+
+class BulkAssignmentTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.users = User.objects.bulk_create(
+            User(username=f"user{i}") for i in range(10)
+        )
+        cls.pks = [user.pk for user in cls.users]
+
+    def setUp(self):
+        self.role = UserManagers()
+        self.role.group
+
+    def test_bulk_add(self):
+        self.role.add(*self.users[:2])
+        with self.assertNumQueries(6):
+            # a read and a write for each batch
+            self.assertEqual(self.role.bulk_add(self.pks, batch_size=4), 8)
+        self.assertEqual(self.role.bulk_add(self.users), 0)
+        self.assertQuerySetEqual(self.role.users(), self.users, ordered=False)
+
+    def test_bulk_remove(self):
+        self.role.bulk_add(self.pks[:5])
+        self.assertEqual(self.role.bulk_remove(self.users[3:], batch_size=2), 2)
+        self.assertQuerySetEqual(self.role.users(), self.users[:3], ordered=False)
+
+    def test_bulk_set(self):
+        self.role.bulk_add(self.pks[:5])
+        self.assertEqual(self.role.bulk_set(self.pks[3:], batch_size=3), (5, 3))
+        self.assertQuerySetEqual(self.role.users(), self.users[3:], ordered=False)
+
+    def test_bulk_signals(self):
+        calls = []
+
+        def receiver(sender, action, instance, reverse, pk_set, **kwargs):
+            calls.append((action, instance, reverse, pk_set))
+
+        m2m_changed.connect(receiver, sender=get_user_model().groups.through)
+        self.addCleanup(
+            m2m_changed.disconnect, receiver, sender=get_user_model().groups.through
+        )
+        self.role.bulk_add(self.pks[:2])
+        self.assertEqual(calls, [])
+        self.role.bulk_add(self.pks[:3], send_signals=True)
+        self.role.bulk_remove(self.pks[:1], send_signals=True)
+        self.assertEqual(
+            calls,
+            [
+                ("pre_add", self.role.group, True, {self.pks[2]}),
+                ("post_add", self.role.group, True, {self.pks[2]}),
+                ("pre_remove", self.role.group, True, {self.pks[0]}),
+                ("post_remove", self.role.group, True, {self.pks[0]}),
+            ],
+        )
+
+    def test_bulk_invalidate_cache(self):
+        user = get_user_model().objects.get(pk=self.pks[0])
+        self.assertFalse(is_user_in_role(user, "User-Managers"))
+        self.role.bulk_add([user])
+        self.assertTrue(is_user_in_role(user, "User-Managers"))
@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.test import TestCase, override_settings
+from django_group_role import get_roles_for_users
+from django_group_role.reconcile import reconcile_roles
+from example_project.routers import ReplicaRouter
+
+
+class ReconcileTestCase(TestCase):
+    databases = {"default", "replica"}
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.users = User.objects.bulk_create(
+            User(username=f"user{i}") for i in range(8)
+        )
+        cls.pks = [user.pk for user in cls.users]
+        users = Group.objects.create(name="Users")
+        managers = Group.objects.create(name="User-Managers")
+        other = Group.objects.create(name="Other")
+        for user in cls.users:
+            user.groups.add(users, other)
+        cls.users[0].groups.add(managers)
+
+    def get_roles(self):
+        roles = get_roles_for_users(
+            self.pks, roles=["Users", "User-Managers", "Erasers"]
+        )
+        return [set(roles[pk]) for pk in self.pks]
+
+    def test_reconcile(self):
+        records = [
+            (self.pks[0], ["Users", "User-Managers"]),
+            (self.pks[1], ["User-Managers", "Unknown"]),
+            (self.pks[2], ["Users"]),
+            (self.pks[4], []),
+            (self.pks[5], ["Erasers", "Users"]),
+        ]
+        report = reconcile_roles(
+            iter(records), roles=["Users", "User-Managers", "Erasers"], batch_size=2
+        )
+        self.assertEqual(report.users, 5)
+        self.assertEqual(report.added, 2)
+        # user 1, 3, 4, 6 and 7 lost the "Users" role
+        self.assertEqual(report.removed, 5)
+        self.assertGreater(report.throughput, 0)
+        self.assertEqual(
+            self.get_roles(),
+            [
+                {"Users", "User-Managers"},
+                {"User-Managers"},
+                {"Users"},
+                set(),
+                set(),
+                {"Erasers", "Users"},
+                set(),
+                set(),
+            ],
+        )
+        # unmanaged groups are left untouched
+        self.assertEqual(Group.objects.get(name="Other").user_set.count(), 8)
+        # nothing changes when reconciled again
+        report = reconcile_roles(
+            records, roles=["Users", "User-Managers", "Erasers"], batch_size=3
+        )
+        self.assertEqual((report.added, report.removed), (0, 0))
+
+    @override_settings(DATABASE_ROUTERS=[ReplicaRouter()])
+    def test_reconcile_routed(self):
+        # memberships are read from the primary, not from the replica
+        with self.assertNumQueries(0, using="replica"):
+            report = reconcile_roles(
+                [(self.pks[0], ["Users", "User-Managers"])],
+                roles=["Users", "User-Managers"],
+            )
+        self.assertEqual(report.added, 0)
+        self.assertEqual(report.removed, 7)
+
+    def test_reconcile_unsorted(self):
+        with self.assertRaisesMessage(
+            ValueError,
+            f"Records must be sorted by user id ({self.pks[0]} follows {self.pks[1]})",
+        ):
+            reconcile_roles([(self.pks[1], []), (self.pks[0], [])])
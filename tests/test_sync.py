@@ -0,0 +1,115 @@
+from django.contrib.auth.models import Group
+from django.test import TestCase
+from guardian.shortcuts import assign_perm
+from django_group_role import post_role_setup, pre_role_setup, registry
+from django_group_role.sync import plan_roles, sync_roles
+from example_project.roles import BasicRole, Erasers, GroupManagers, UserManagers
+
+
+class SyncTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        group = Group.objects.create(name="Users")
+        assign_perm("auth.delete_user", group)
+        assign_perm("auth.view_user", group)
+
+    def test_sync(self):
+        report = sync_roles([BasicRole, UserManagers, Erasers], clear=True)
+        self.assertEqual(
+            report.queries, {"groups": 2, "permissions": 1, "current": 1, "write": 2}
+        )
+        users = report.roles["Users"]
+        self.assertFalse(users.created)
+        self.assertEqual(users.diff.added, {"auth.view_group"})
+        self.assertEqual(users.diff.removed, {"auth.delete_user"})
+        self.assertEqual(users.diff.unchanged, {"auth.view_user"})
+        managers = report.roles["User-Managers"]
+        self.assertTrue(managers.created)
+        self.assertEqual(
+            managers.diff.added,
+            {"auth.view_user", "auth.view_group", "auth.add_user", "auth.change_user"},
+        )
+        self.assertEqual(list(report.errors), ["Erasers"])
+        self.assertEqual(
+            str(report.errors["Erasers"]),
+            "Permission broken (auth) cannot be bound to role",
+        )
+        self.assertIsNone(report.roles["Erasers"].diff)
+        self.assertTrue(Group.objects.filter(name="Erasers").exists())
+        self.assertEqual(
+            set(
+                Group.objects.get(name="Users").permissions.values_list(
+                    "codename", flat=True
+                )
+            ),
+            {"view_user", "view_group"},
+        )
+        self.assertEqual(Group.objects.get(name="User-Managers").permissions.count(), 4)
+
+    def test_sync_without_changes(self):
+        sync_roles()
+        report = sync_roles()
+        self.assertEqual(
+            report.queries, {"groups": 1, "permissions": 1, "current": 1, "write": 0}
+        )
+        self.assertEqual(len(report.roles), len(registry))
+        for result in report.roles.values():
+            self.assertFalse(result.created)
+            self.assertFalse(result.diff and result.diff.added)
+
+    def test_sync_signals(self):
+        calls = []
+
+        def receiver(signal, sender, **kwargs):
+            calls.append((signal, sender, kwargs.get("result")))
+
+        pre_role_setup.connect(receiver)
+        post_role_setup.connect(receiver)
+        self.addCleanup(pre_role_setup.disconnect, receiver)
+        self.addCleanup(post_role_setup.disconnect, receiver)
+        report = sync_roles([GroupManagers, Erasers])
+        self.assertEqual(
+            calls,
+            [
+                (pre_role_setup, GroupManagers, None),
+                (pre_role_setup, Erasers, None),
+                (post_role_setup, GroupManagers, report.roles["Group Managers"].diff),
+            ],
+        )
+
+    def test_plan(self):
+        report = plan_roles([BasicRole, UserManagers, Erasers], clear=True)
+        self.assertEqual(
+            report.queries, {"groups": 1, "permissions": 1, "current": 1, "write": 0}
+        )
+        self.assertEqual(
+            report.as_dict()["roles"],
+            {
+                "Users": {
+                    "created": False,
+                    "added": ["auth.view_group"],
+                    "removed": ["auth.delete_user"],
+                    "errors": [],
+                },
+                "User-Managers": {
+                    "created": True,
+                    "added": [
+                        "auth.add_user",
+                        "auth.change_user",
+                        "auth.view_group",
+                        "auth.view_user",
+                    ],
+                    "removed": [],
+                    "errors": [],
+                },
+                "Erasers": {
+                    "created": True,
+                    "added": [],
+                    "removed": [],
+                    "errors": ["auth.broken"],
+                },
+            },
+        )
+        # nothing was written
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(Group.objects.get(name="Users").permissions.count(), 2)
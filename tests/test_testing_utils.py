@@ -1,11 +1,15 @@
+import unittest
+
 from django import VERSION
-from django.contrib.auth.models import Group
+from django.contrib.auth.models import Group, Permission
 from django.test import TestCase
+from django_group_role.roles import registry
 from django_group_role.test import RoleEnabledTestMixin
 
 
 class BaseTestingTestCase(RoleEnabledTestMixin, TestCase):
     if VERSION < (4, 2):
+
         def assertQuerySetEqual(self, *args, **kwargs):
             return super().assertQuerysetEqual(*args, **kwargs)
 
@@ -96,3 +100,51 @@ class OverrideFromRolesTestCase(BaseTestingTestCase):
             transform=lambda p: p.natural_key(),
             ordered=False,
         )
+
+
+class SnapshotTestCase(BaseTestingTestCase):
+    roles = ["Users", "User-Managers"]
+
+    def test_restore(self):
+        # roles already set up are skipped
+        with self.assertNumQueries(3):
+            self.__class__.setUpTestData()
+        Group.objects.all().delete()
+        with self.assertNumQueries(4):
+            self.__class__.setUpTestData()
+        self.assertEqual(Group.objects.get(name="User-Managers").permissions.count(), 4)
+
+    def test_restore_partial(self):
+        # permissions bound to existing groups are not bound again
+        Group.objects.filter(name="User-Managers").delete()
+        Group.objects.get(name="Users").permissions.remove(
+            Permission.objects.get(codename="view_group")
+        )
+        self.__class__.setUpTestData()
+        self.assertEqual(Group.objects.get(name="Users").permissions.count(), 2)
+        self.assertEqual(Group.objects.get(name="User-Managers").permissions.count(), 4)
+
+    def test_stale_snapshot(self):
+        # permissions created again get new primary keys
+        perm = Permission.objects.get(codename="add_user")
+        perm.delete()
+        perm.pk = None
+        perm.save()
+        self.__class__.setUpTestData()
+        self.assertTrue(
+            Group.objects.get(name="User-Managers").permissions.filter(pk=perm.pk)
+        )
+
+    def test_registry_isolation(self):
+        class IsolatedTestCase(RoleEnabledTestMixin, TestCase):
+            roles_from = "example_project.roles_secondary"
+            clear_role_registry = True
+
+            def test_registry(self):
+                self.assertEqual(set(registry), {"Base", "Managers", "Groupers"})
+
+        roles = dict(registry)
+        result = unittest.TestResult()
+        unittest.defaultTestLoader.loadTestsFromTestCase(IsolatedTestCase).run(result)
+        self.assertTrue(result.wasSuccessful(), result.failures + result.errors)
+        self.assertEqual(dict(registry), roles)
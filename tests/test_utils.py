@@ -1,5 +1,12 @@
+import pickle
+
 from django.test import SimpleTestCase
-from django_group_role.utils import map_permissions
+from django_group_role.roles import Role
+from django_group_role.utils import (
+    PermissionMap,
+    map_permissions,
+    merge_permission_maps,
+)
 
 
 class UtilsSimpleTestCase(SimpleTestCase):
@@ -122,3 +129,48 @@ class UtilsSimpleTestCase(SimpleTestCase):
                 },
             },
         )
+
+    def test_map_permissions_immutable(self):
+        perm_map = map_permissions({"auth.user": ["view_user"]})
+        self.assertIsInstance(perm_map, PermissionMap)
+        self.assertIsInstance(perm_map["auth"]["user"], frozenset)
+        with self.assertRaises(TypeError):
+            perm_map["auth"]["group"] = frozenset({"view_group"})
+        self.assertEqual(perm_map.names, {"auth.view_user"})
+
+    def test_map_permissions_interned(self):
+        perm_map = map_permissions(["auth.view_user"], {"auth.user": ["add_user"]})
+        self.assertIs(
+            perm_map,
+            map_permissions({"auth": {"user": ["add_user"]}}, ["auth.view_user"]),
+        )
+        self.assertIs(PermissionMap(perm_map), perm_map)
+        self.assertIs(pickle.loads(pickle.dumps(perm_map)), perm_map)
+
+    def test_merge_permission_maps_memoized(self):
+        first = map_permissions(["auth.view_user"])
+        second = map_permissions(["auth.view_group"])
+        merged = merge_permission_maps(first, second)
+        self.assertEqual(merged.names, {"auth.view_user", "auth.view_group"})
+        hits = merge_permission_maps.cache_info().hits
+        self.assertIs(merge_permission_maps(first, second), merged)
+        self.assertEqual(merge_permission_maps.cache_info().hits, hits + 1)
+        # empty maps are skipped
+        self.assertIs(merge_permission_maps(first, map_permissions()), first)
+
+    def test_role_permissions_shared(self):
+        class BaseRole(Role, register=False):
+            name = "Base"
+            permissions = ["auth.view_user"]
+
+        class ChildRole(BaseRole, register=False):
+            name = "Child"
+
+        class OtherRole(Role, register=False):
+            name = "Other"
+            permissions = ("auth.view_user",)
+
+        # inherited and equivalent declarations share the same map
+        self.assertIs(ChildRole._permissions, BaseRole._permissions)
+        self.assertIs(OtherRole._permissions, BaseRole._permissions)
+        self.assertEqual(ChildRole._perm_index, {"auth.view_user"})
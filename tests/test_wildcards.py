@@ -0,0 +1,104 @@
+from django.contrib.auth.models import Group
+from django.test import TestCase
+from django_group_role import Role
+from django_group_role.roles import _RoleRegistry
+from django_group_role.sync import sync_roles
+from django_group_role.utils import expand_wildcards, map_permissions
+
+
+class AuthAdmins(Role, register=False):
+    name = "Auth Admins"
+    permissions = ["auth.*"]
+
+
+class GroupAdmins(Role, register=False):
+    name = "Group Admins"
+    permissions = {"auth.group": "*", "auth.user": ["view_user"]}
+
+
+class MissingAdmins(Role, register=False):
+    name = "Missing Admins"
+    permissions = {"missing": "*"}
+
+
+class WildcardTestCase(TestCase):
+    def test_map_permissions(self):
+        perm_map = map_permissions(["auth.*"])
+        self.assertIs(perm_map, map_permissions({"auth": "*"}))
+        self.assertEqual(perm_map.wildcards, {"auth": {"_codenames"}})
+        self.assertEqual(perm_map.names, set())
+
+        perm_map = map_permissions({"auth.group": ["view_group", "*"]})
+        self.assertIs(perm_map, map_permissions({"auth": {"group": "*"}}))
+        self.assertEqual(perm_map, {"auth": {"group": {"*"}}})
+        self.assertEqual(perm_map.wildcards, {"auth": {"group"}})
+
+    def test_has_perm(self):
+        with self.assertNumQueries(0):
+            role = AuthAdmins()
+            self.assertTrue(role.has_perm("auth.add_user"))
+            self.assertTrue(role.has_perms("auth.add_user", "auth.view_permission"))
+            # only permissions declared by models are granted
+            self.assertFalse(role.has_perm("auth.custom"))
+            self.assertFalse(role.has_perm("other.add_user"))
+            role = GroupAdmins()
+            self.assertTrue(role.has_perm("auth.delete_group"))
+            self.assertTrue(role.has_perm("auth.view_user"))
+            self.assertFalse(role.has_perm("auth.add_user"))
+            self.assertTrue(role.has_any_perm("auth.add_user", "auth.add_group"))
+            self.assertFalse(role.has_perms("auth.add_user", "auth.add_group"))
+
+    def test_roles_with_perm(self):
+        registry = _RoleRegistry(
+            {role.name: role for role in (AuthAdmins, GroupAdmins)}
+        )
+        self.assertEqual(
+            registry.roles_with_perm("auth.add_group"),
+            {"Auth Admins", "Group Admins"},
+        )
+        self.assertEqual(
+            registry.roles_with_perm("auth.view_user"),
+            {"Auth Admins", "Group Admins"},
+        )
+        self.assertEqual(registry.roles_with_perm("auth.add_user"), {"Auth Admins"})
+        self.assertEqual(registry.roles_with_perm("other.add_user"), set())
+
+    def test_expand_wildcards(self):
+        perm_maps = [AuthAdmins._permissions, GroupAdmins._permissions]
+        with self.assertNumQueries(1):
+            expanded = expand_wildcards(perm_maps)
+        self.assertEqual(
+            expanded[GroupAdmins._permissions],
+            {
+                "auth": {
+                    "group": {
+                        "add_group",
+                        "change_group",
+                        "delete_group",
+                        "view_group",
+                    },
+                    "user": {"view_user"},
+                }
+            },
+        )
+        self.assertEqual(
+            set(expanded[AuthAdmins._permissions]["auth"]),
+            {"group", "permission", "user"},
+        )
+        with self.assertNumQueries(0):
+            expand_wildcards([map_permissions(["auth.view_user"])])
+
+    def test_sync(self):
+        report = sync_roles([AuthAdmins, GroupAdmins, MissingAdmins])
+        self.assertEqual(report.queries["permissions"], 2)
+        self.assertEqual(len(report.roles["Auth Admins"].diff.added), 12)
+        self.assertEqual(
+            set(
+                Group.objects.get(name="Group Admins").permissions.values_list(
+                    "codename", flat=True
+                )
+            ),
+            {"add_group", "change_group", "delete_group", "view_group", "view_user"},
+        )
+        self.assertEqual(list(report.errors), ["Missing Admins"])
+        self.assertEqual(report.errors["Missing Admins"].permissions, ("missing.*",))